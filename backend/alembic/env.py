@@ -17,10 +17,16 @@ fileConfig(config.config_file_name)
 
 # Importa models
 from app.models import Base
+from app.core.search import SEARCH_OBJECTS
 
 # Define metadata
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Índice de busca (tsvector/FTS5) é criado por DDL própria, fora do ORM."""
+    return name not in SEARCH_OBJECTS and not (name or "").startswith("notes_fts")
+
 # Seta URL do banco dinamicamente
 config.set_main_option("sqlalchemy.url", DATABASE_URL)
 
@@ -31,7 +37,8 @@ def run_migrations_offline():
     context.configure(
         url=url,
         target_metadata=target_metadata,
-        literal_binds=True
+        literal_binds=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -48,7 +55,8 @@ def run_migrations_online():
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,44 @@
+"""sync_events group scope and cursor indexes
+
+Revision ID: 3b9d2f6a1c47
+Revises: 0fe13173cad0
+Create Date: 2026-10-18 09:12:05.114203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2f6a1c47'
+down_revision: Union[str, Sequence[str], None] = '0fe13173cad0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sync_events', sa.Column('group_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_sync_events_group_id_groups', 'sync_events', 'groups',
+        ['group_id'], ['id'], ondelete='CASCADE',
+    )
+    # Preenche o grupo dos eventos existentes a partir da nota.
+    op.execute(
+        "UPDATE sync_events SET group_id = "
+        "(SELECT notes.group_id FROM notes WHERE notes.id = sync_events.note_id)"
+    )
+    op.create_index('ix_sync_events_group_id_id', 'sync_events', ['group_id', 'id'], unique=False)
+    op.create_index('ix_sync_events_group_id_updated_at', 'sync_events', ['group_id', 'updated_at'], unique=False)
+    op.create_index('ix_sync_events_updated_at', 'sync_events', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sync_events_updated_at', table_name='sync_events')
+    op.drop_index('ix_sync_events_group_id_updated_at', table_name='sync_events')
+    op.drop_index('ix_sync_events_group_id_id', table_name='sync_events')
+    op.drop_constraint('fk_sync_events_group_id_groups', 'sync_events', type_='foreignkey')
+    op.drop_column('sync_events', 'group_id')
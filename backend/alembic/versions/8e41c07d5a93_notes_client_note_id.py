@@ -0,0 +1,45 @@
+"""notes client_note_id identity
+
+Revision ID: 8e41c07d5a93
+Revises: 3b9d2f6a1c47
+Create Date: 2026-10-18 10:02:41.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41c07d5a93'
+down_revision: Union[str, Sequence[str], None] = '3b9d2f6a1c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('client_note_id', sa.String(length=64), nullable=True))
+    # Até aqui o id do cliente ficava guardado em notes.geometry. Ids maiores
+    # que a coluna não são cortados (duas notas virariam uma): ficam com o id
+    # do servidor.
+    op.execute(
+        "UPDATE notes SET client_note_id = CASE "
+        "WHEN geometry IS NOT NULL AND LENGTH(geometry) <= 64 THEN geometry "
+        "ELSE CAST(id AS VARCHAR(64)) END"
+    )
+    with op.batch_alter_table('notes') as batch_op:
+        batch_op.alter_column('client_note_id', existing_type=sa.String(length=64), nullable=False)
+    op.create_index(
+        'uq_notes_group_client_note_id',
+        'notes',
+        [sa.text('coalesce(group_id, 0)'), 'client_note_id'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_notes_group_client_note_id', table_name='notes')
+    op.drop_column('notes', 'client_note_id')
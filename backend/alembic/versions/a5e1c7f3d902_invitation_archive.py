@@ -0,0 +1,57 @@
+"""invitation archive
+
+Revision ID: a5e1c7f3d902
+Revises: f2c6d9a4b817
+Create Date: 2026-10-18 18:12:54.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5e1c7f3d902'
+down_revision: Union[str, Sequence[str], None] = 'f2c6d9a4b817'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'group_invitations_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('email', sa.String(length=200), nullable=True),
+        sa.Column('token', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('created_by_user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        op.f('ix_group_invitations_archive_group_id'), 'group_invitations_archive', ['group_id'], unique=False
+    )
+    op.create_index(
+        op.f('ix_group_invitations_archive_token'), 'group_invitations_archive', ['token'], unique=False
+    )
+    op.create_index(
+        'ix_group_invitations_status_expires_at',
+        'group_invitations',
+        ['status', 'expires_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_group_invitations_status_expires_at', table_name='group_invitations')
+    op.drop_index(op.f('ix_group_invitations_archive_token'), table_name='group_invitations_archive')
+    op.drop_index(op.f('ix_group_invitations_archive_group_id'), table_name='group_invitations_archive')
+    op.drop_table('group_invitations_archive')
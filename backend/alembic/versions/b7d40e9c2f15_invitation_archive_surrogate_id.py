@@ -0,0 +1,47 @@
+"""invitation archive surrogate id
+
+Revision ID: b7d40e9c2f15
+Revises: c3f8a2d61e07
+Create Date: 2026-10-18 21:40:27.631954
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d40e9c2f15'
+down_revision: Union[str, Sequence[str], None] = 'c3f8a2d61e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('group_invitations_archive', sa.Column('invitation_id', sa.Integer(), nullable=True))
+    # As linhas já arquivadas guardavam o id do convite no próprio id; ele
+    # continua como chave e é copiado para invitation_id.
+    op.execute("UPDATE group_invitations_archive SET invitation_id = id")
+    if op.get_bind().dialect.name == 'postgresql':
+        # No SQLite o INTEGER PRIMARY KEY já é o rowid; no Postgres a chave
+        # ganha a sequência que um SERIAL teria, a partir do maior id atual.
+        op.execute("CREATE SEQUENCE group_invitations_archive_id_seq OWNED BY group_invitations_archive.id")
+        op.execute(
+            "SELECT setval('group_invitations_archive_id_seq', "
+            "COALESCE((SELECT MAX(id) FROM group_invitations_archive), 0) + 1, false)"
+        )
+        op.execute(
+            "ALTER TABLE group_invitations_archive "
+            "ALTER COLUMN id SET DEFAULT nextval('group_invitations_archive_id_seq')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TABLE group_invitations_archive ALTER COLUMN id DROP DEFAULT")
+        op.execute("DROP SEQUENCE group_invitations_archive_id_seq")
+    with op.batch_alter_table('group_invitations_archive') as batch_op:
+        batch_op.drop_column('invitation_id')
@@ -0,0 +1,31 @@
+"""sync_events created_at
+
+Revision ID: c3f8a2d61e07
+Revises: a5e1c7f3d902
+Create Date: 2026-10-18 20:05:13.418207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a2d61e07'
+down_revision: Union[str, Sequence[str], None] = 'a5e1c7f3d902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sync_events', sa.Column('created_at', sa.DateTime(), nullable=True))
+    # Eventos existentes contam a retenção a partir da migração: o updated_at
+    # deles é o horário do cliente.
+    op.execute("UPDATE sync_events SET created_at = CURRENT_TIMESTAMP")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('sync_events', 'created_at')
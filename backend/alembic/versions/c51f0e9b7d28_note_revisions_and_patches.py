@@ -0,0 +1,38 @@
+"""note revisions and patch sync events
+
+Revision ID: c51f0e9b7d28
+Revises: 8e41c07d5a93
+Create Date: 2026-10-18 11:37:12.804451
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c51f0e9b7d28'
+down_revision: Union[str, Sequence[str], None] = '8e41c07d5a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('notes', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('sync_events', sa.Column('revision', sa.Integer(), nullable=True))
+    op.add_column('sync_events', sa.Column('base_revision', sa.Integer(), nullable=True))
+    op.add_column('sync_events', sa.Column('patch', sa.Text(), nullable=True))
+    # Notas existentes começam na revisão 1; o hash é calculado na próxima gravação.
+    op.execute("UPDATE notes SET revision = 1")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('sync_events', 'patch')
+    op.drop_column('sync_events', 'base_revision')
+    op.drop_column('sync_events', 'revision')
+    op.drop_column('notes', 'revision')
+    op.drop_column('notes', 'content_hash')
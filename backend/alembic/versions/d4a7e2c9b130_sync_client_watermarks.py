@@ -0,0 +1,49 @@
+"""sync client watermarks
+
+Revision ID: d4a7e2c9b130
+Revises: c51f0e9b7d28
+Create Date: 2026-10-18 14:02:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7e2c9b130'
+down_revision: Union[str, Sequence[str], None] = 'c51f0e9b7d28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'sync_clients',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('acked_event_id', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_seen_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('client_id'),
+    )
+    op.create_index(
+        'ix_sync_clients_group_id_acked_event_id',
+        'sync_clients',
+        ['group_id', 'acked_event_id'],
+        unique=False,
+    )
+    op.create_index('ix_sync_events_note_id_id', 'sync_events', ['note_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sync_events_note_id_id', table_name='sync_events')
+    op.drop_index('ix_sync_clients_group_id_acked_event_id', table_name='sync_clients')
+    op.drop_table('sync_clients')
@@ -0,0 +1,74 @@
+"""note full-text search
+
+Revision ID: e8b3f1a6c254
+Revises: d4a7e2c9b130
+Create Date: 2026-10-18 16:21:05.472913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.search import (
+    POSTGRES_DDL,
+    POSTGRES_DROP_DDL,
+    SQLITE_DDL,
+    SQLITE_DROP_DDL,
+    extract_text,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3f1a6c254'
+down_revision: Union[str, Sequence[str], None] = 'd4a7e2c9b130'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK = 1000
+
+
+def _backfill_search_text() -> None:
+    # Extrai o texto das notas existentes em lotes, por id crescente.
+    bind = op.get_bind()
+    notes = sa.table('notes', sa.column('id', sa.Integer), sa.column('content', sa.Text), sa.column('search_text', sa.Text))
+    update = notes.update().where(notes.c.id == sa.bindparam('note_id')).values(search_text=sa.bindparam('text'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(notes.c.id, notes.c.content)
+            .where(notes.c.id > last_id)
+            .order_by(notes.c.id)
+            .limit(BACKFILL_CHUNK)
+        ).all()
+        if not rows:
+            return
+        bind.execute(update, [{'note_id': row.id, 'text': extract_text(row.content)} for row in rows])
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('search_text', sa.Text(), nullable=True))
+    _backfill_search_text()
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # A coluna gerada é calculada para as linhas existentes (reescreve a tabela).
+        for statement in POSTGRES_DDL:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRES_DROP_DDL:
+            op.execute(statement)
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DROP_DDL:
+            op.execute(statement)
+    op.drop_column('notes', 'search_text')
@@ -0,0 +1,44 @@
+"""note alarm scheduler
+
+Revision ID: f2c6d9a4b817
+Revises: e8b3f1a6c254
+Create Date: 2026-10-18 16:41:07.552914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6d9a4b817'
+down_revision: Union[str, Sequence[str], None] = 'e8b3f1a6c254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('alarm_fired_at', sa.DateTime(), nullable=True))
+    # Alarmes que já passaram contam como emitidos: o agendador não os
+    # dispara na primeira partida.
+    op.execute(
+        "UPDATE notes SET alarm_fired_at = coalesce(snooze_until, alarm_at) "
+        "WHERE coalesce(snooze_until, alarm_at) < CURRENT_TIMESTAMP"
+    )
+    fire_at = sa.func.coalesce(sa.column('snooze_until'), sa.column('alarm_at'))
+    op.create_index(
+        'ix_notes_alarm_fire_at',
+        'notes',
+        [fire_at, sa.column('id')],
+        unique=False,
+        postgresql_where=fire_at.is_not(None),
+        sqlite_where=fire_at.is_not(None),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notes_alarm_fire_at', table_name='notes')
+    op.drop_column('notes', 'alarm_fired_at')
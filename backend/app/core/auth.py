@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError
+from sqlalchemy.orm import Session
+
+from app.core.security import decode_access_token
+from app.crud import users as users_crud
+from app.database import get_db
+from app.schemas.auth import CurrentUser
+
+# Tokens já verificados guardados em memória (LRU com TTL)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified token -> user snapshot. An entry lives until the
+    token's `exp` or the TTL, whichever comes first, and can be dropped for
+    every token of a user when that user changes.
+    """
+
+    def __init__(self, max_size: int, ttl: int) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, CurrentUser]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[CurrentUser]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, token: str) -> Optional[CurrentUser]:
+        """Like get, without touching the LRU order or the hit counters."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.time():
+                return None
+            return entry[1]
+
+    def put(self, token: str, user: CurrentUser, token_exp: float) -> None:
+        expires_at = min(time.time() + self.ttl, token_exp)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (expires_at, user)
+            self._by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for token in list(self._by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, token: str) -> None:
+        _, user = self._entries.pop(token)
+        tokens = self._by_user.get(user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[user.id]
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL)
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or missing token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _resolve_user(token: str, db: Session) -> Optional[CurrentUser]:
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    try:
+        claims = decode_access_token(token)
+        user_id = int(claims["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+    user = users_crud.get_user(db, user_id)
+    if user is None:
+        return None
+
+    snapshot = CurrentUser.from_orm(user)
+    token_cache.put(token, snapshot, float(claims["exp"]))
+    return snapshot
+
+
+def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+    db: Session = Depends(get_db),
+) -> CurrentUser:
+    """
+    Resolve the bearer token to the calling user. Cached tokens skip both
+    the JWT verification and the user lookup; the session stays unused.
+    """
+    if credentials is None:
+        raise _unauthorized()
+    user = _resolve_user(credentials.credentials, db)
+    if user is None:
+        raise _unauthorized()
+    return user
+
+
+def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+    db: Session = Depends(get_db),
+) -> Optional[CurrentUser]:
+    """Like get_current_user, but anonymous or invalid tokens yield None."""
+    if credentials is None:
+        return None
+    return _resolve_user(credentials.credentials, db)
+
+
+def caller_group(user: CurrentUser, group_id: Optional[int]) -> int:
+    """The caller's own group; asking for any other group is forbidden."""
+    if user.group_id is None or (group_id is not None and group_id != user.group_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not a member of this group")
+    return user.group_id
+
+
+def invalidate_user(user_id: int) -> None:
+    token_cache.invalidate_user(user_id)
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Dict, Set
+
+
+class Subscription:
+    """Wake-up signal for one connected client of a group."""
+
+    def __init__(self, group_id: int, loop: asyncio.AbstractEventLoop):
+        self.group_id = group_id
+        self._loop = loop
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        # Pode ser chamado a partir das threads do threadpool das rotas síncronas.
+        self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self) -> None:
+        await self._event.wait()
+        self._event.clear()
+
+
+class SyncBroadcaster:
+    """
+    In-process fan-out of "group has new sync events" notifications.
+    Notifications carry no payload: subscribers read the change feed from
+    their own cursor, so bursts coalesce into a single query.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, group_id: int) -> Subscription:
+        subscription = Subscription(group_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[group_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.group_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.group_id]
+
+    def publish(self, group_id: int | None) -> None:
+        if group_id is None:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.get(group_id, ()))
+        for subscription in subscribers:
+            subscription.notify()
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+broadcaster = SyncBroadcaster()
@@ -0,0 +1,73 @@
+"""
+Shared pieces of the bulk endpoints (user import, bulk invites): the body
+is a JSON list or CSV with a header row, each row is validated on its own,
+and the outcome goes back as NDJSON, one line per row plus a summary.
+"""
+import csv
+import io
+import json
+import os
+from collections import Counter
+from typing import Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+
+# Linhas aceitas por requisição
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "5000"))
+# Linhas por lote: um hash paralelo, um INSERT e um commit por lote
+BULK_CHUNK = int(os.getenv("BULK_CHUNK", "100"))
+NDJSON = "application/x-ndjson"
+
+ParsedRow = Tuple[int, Union[BaseModel, str]]  # (linha, modelo ou erro)
+
+
+def _records(body: bytes, content_type: str) -> List[dict]:
+    try:
+        text = body.decode("utf-8-sig")
+        if content_type.split(";")[0].strip() == "text/csv":
+            # Células vazias contam como ausentes (defaults do modelo)
+            reader = csv.DictReader(io.StringIO(text))
+            return [{k: v for k, v in row.items() if k and v not in (None, "")} for row in reader]
+        data = json.loads(text)
+    except (UnicodeDecodeError, ValueError, csv.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed body")
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a list of objects")
+    return data
+
+
+def parse_rows(body: bytes, content_type: str, model: Type[BaseModel]) -> List[ParsedRow]:
+    """Rows of a JSON or CSV body, numbered from 1; invalid rows carry their error."""
+    records = _records(body, content_type)
+    if len(records) > BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_MAX_ROWS} rows per request",
+        )
+    rows: List[ParsedRow] = []
+    for number, record in enumerate(records, start=1):
+        try:
+            rows.append((number, model.parse_obj(record)))
+        except ValidationError as exc:
+            rows.append((number, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())))
+    return rows
+
+
+def chunks(items: List, size: int = BULK_CHUNK) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def outcome(row: int, status_: str, email: Optional[str] = None, **extra) -> dict:
+    return {"row": row, "status": status_, "email": email, **extra}
+
+
+def ndjson_lines(outcomes: Iterable[dict]) -> Iterator[bytes]:
+    """Each outcome as a JSON line, then {"summary": {status: count}}."""
+    counts: Counter = Counter()
+    for item in outcomes:
+        counts[item["status"]] += 1
+        yield (json.dumps(jsonable_encoder(item)) + "\n").encode("utf-8")
+    yield (json.dumps({"summary": dict(counts)}) + "\n").encode("utf-8")
@@ -0,0 +1,225 @@
+"""
+Read-through cache for small per-group snapshots (group, members,
+invitations). Values are pydantic snapshots, never ORM objects, so they
+outlive the session that loaded them. The backend is either an in-process
+LRU or a shared key/value store (redis); without redis the shared backend
+runs on a local stand-in with the same interface.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependência opcional
+    redis = None
+
+# memory | shared
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Prefixo das chaves no backend compartilhado
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "stickycutie:")
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """Bounded LRU with a per-entry TTL, local to the process."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= now:
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class LocalKeyValueStore:
+    """
+    In-process stand-in for the redis commands the shared backend uses
+    (get / set with ex / delete / scan_iter). Lets CACHE_BACKEND=shared run
+    in development and tests without a server.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._data: dict = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ex: int) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex, value)
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match: str):
+        prefix = match.rstrip("*")
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+        return iter(keys)
+
+
+class SharedBackend:
+    """Cache kept in a key/value store shared by every worker process."""
+
+    def __init__(self, client, prefix: str = CACHE_KEY_PREFIX) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.evictions = 0  # quem despeja é o servidor (maxmemory-policy)
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return _MISSING
+        return pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self) -> None:
+        self.delete_prefix("")
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class ReadThroughCache:
+    """
+    get_or_load() returns the cached value or calls the loader and stores
+    its result. Loaders returning None are not cached, so a missing row is
+    looked up again next time.
+    """
+
+    def __init__(self, backend, ttl: int) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not _MISSING:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if value is not _MISSING:
+            return value
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value, ttl or self.ttl)
+        return value
+
+    def invalidate(self, *keys: str) -> None:
+        self.backend.delete(*keys)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        """Drop every key starting with `prefix` (e.g. all pages of a list)."""
+        self.backend.delete_prefix(prefix)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "entries": self.backend.size(),
+            "ttl": self.ttl,
+        }
+
+
+def _make_backend():
+    if CACHE_BACKEND == "shared":
+        if redis is not None and CACHE_URL:
+            return SharedBackend(redis.Redis.from_url(CACHE_URL))
+        return SharedBackend(LocalKeyValueStore())
+    return MemoryBackend(CACHE_MAX_ENTRIES)
+
+
+cache = ReadThroughCache(_make_backend(), CACHE_TTL)
+
+
+# Chaves usadas pelos CRUDs; ficam aqui para leitura e invalidação baterem.
+def group_key(group_id: int) -> str:
+    return f"group:{group_id}"
+
+
+def group_users_key(group_id: int) -> str:
+    return f"group:{group_id}:users:"
+
+
+def group_invitations_key(group_id: int) -> str:
+    return f"group:{group_id}:invitations:"
+
+
+def page_key(prefix: str, cursor: Optional[str], limit: Optional[int], version: str = "") -> str:
+    # Uma entrada por página; a invalidação remove todas pelo prefixo.
+    # `version` (o ETag da lista) entra na chave: com o cache local, a escrita
+    # de outro worker não invalida este, e o corpo antigo não pode sair com o
+    # ETag novo.
+    return f"{prefix}{cursor or ''}:{limit}:{version}"
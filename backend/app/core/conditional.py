@@ -0,0 +1,51 @@
+"""
+Conditional GET helpers. Routes compute a cheap version tuple (row count,
+max(updated_at), max(id), ...) with one aggregate query, turn it into a weak
+ETag and answer 304 before loading or serializing the rows.
+
+Only If-None-Match is honoured. No Last-Modified is sent: max(updated_at)
+does not move when a row is deleted or when a write carries an older
+client timestamp, so If-Modified-Since would answer 304 for changed lists.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+
+# Obriga o cliente a revalidar sempre; com o ETag a revalidação é barata.
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return 'W/"%s"' % hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _opaque(tag: str) -> str:
+    # Comparação fraca (RFC 9110): ignora o prefixo W/.
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    wanted = _opaque(etag)
+    return any(_opaque(tag) == wanted for tag in header.split(","))
+
+
+def validator_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response when If-None-Match still matches, otherwise None."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None or not _etag_matches(if_none_match, etag):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag))
+
+
+def apply_validators(response: Response, etag: str) -> None:
+    response.headers.update(validator_headers(etag))
+
@@ -0,0 +1,315 @@
+"""
+Content negotiation for the /sync routes: compressed request and response
+bodies (zstd, br, gzip) and MessagePack as an alternative to JSON.
+brotli, zstandard and msgpack are optional; missing ones are simply not
+offered.
+"""
+import io
+import json
+import zlib
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependência opcional
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependência opcional
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+# Corpo de requisição máximo depois de descompactado
+MAX_DECODED_BODY = 32 * 1024 * 1024
+# Respostas menores que isso não compensam a compressão
+MINIMUM_COMPRESS_SIZE = 512
+# Respostas que não podem ter corpo (RFC 9110); passam sem codificação
+BODYLESS_STATUS = (204, 304)
+# Só o brotli >= 1.2 limita a saída do Decompressor; sem isso, corpos br são recusados
+_BROTLI_LIMITED = brotli is not None and hasattr(brotli.Decompressor, "can_accept_more_data")
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+def supported_encodings() -> List[str]:
+    """Response encodings we can produce, in order of preference."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str) -> None:
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor().compressobj()
+            self.compress, self._finish = self._obj.compress, self._obj.flush
+        elif encoding == "br":
+            self._obj = brotli.Compressor()
+            self.compress, self._finish = self._obj.process, self._obj.finish
+        else:
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self.compress, self._finish = self._obj.compress, self._obj.flush
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def _brotli_decompress(body: bytes, limit: int) -> bytes:
+    decoder = brotli.Decompressor()
+    parts: List[bytes] = []
+    size = 0
+    data = body
+    while True:
+        chunk = decoder.process(data, output_buffer_limit=limit - size)
+        data = b""
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+        if decoder.can_accept_more_data():
+            if not decoder.is_finished():
+                raise ValueError("truncated brotli stream")
+            break
+    return b"".join(parts)
+
+
+def _zstd_decompress(body: bytes, limit: int) -> bytes:
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body), read_across_frames=True)
+    parts: List[bytes] = []
+    size = 0
+    while size < limit:
+        chunk = reader.read(limit - size)
+        if not chunk:
+            break
+        parts.append(chunk)
+        size += len(chunk)
+    return b"".join(parts)
+
+
+def decompress_body(body: bytes, encoding: str) -> bytes:
+    """
+    Decode a request body, refusing anything that inflates past
+    MAX_DECODED_BODY. Every decoder stops producing output at the cap, so
+    a small decompression bomb never gets expanded in memory.
+    """
+    encoding = encoding.lower().strip()
+    if encoding in ("", "identity"):
+        return body
+    limit = MAX_DECODED_BODY + 1
+    if encoding in ("gzip", "deflate"):
+        decoder = zlib.decompressobj(47)  # aceita gzip e zlib
+        data = decoder.decompress(body, limit)
+    elif encoding == "br" and _BROTLI_LIMITED:
+        data = _brotli_decompress(body, limit)
+    elif encoding == "zstd" and zstandard is not None:
+        data = _zstd_decompress(body, limit)
+    else:
+        raise ValueError(encoding)
+    if len(data) > MAX_DECODED_BODY:
+        raise BodyTooLarge()
+    return data
+
+
+def _decode_body(body: bytes, content_encoding: str, request_msgpack: bool) -> bytes:
+    body = decompress_body(body, content_encoding)
+    if request_msgpack:
+        if msgpack is None:
+            raise ValueError("msgpack")
+        body = json.dumps(msgpack.unpackb(body, raw=False)).encode("utf-8")
+    return body
+
+
+def _wants_msgpack(headers: Headers) -> bool:
+    accept = headers.get("accept", "")
+    return msgpack is not None and any(kind in accept for kind in MSGPACK_TYPES)
+
+
+def _is_msgpack(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() in MSGPACK_TYPES
+
+
+class SyncEncodingMiddleware:
+    """ASGI middleware applying the negotiation above to paths under `prefix`."""
+
+    def __init__(self, app, prefix: str = "/sync", minimum_size: int = MINIMUM_COMPRESS_SIZE) -> None:
+        self.app = app
+        self.prefix = prefix
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "")
+        request_msgpack = _is_msgpack(headers.get("content-type", ""))
+        if content_encoding or request_msgpack:
+            try:
+                scope, receive = await self._decode_request(scope, receive, content_encoding, request_msgpack)
+            except BodyTooLarge:
+                await JSONResponse({"detail": "Request body too large"}, status_code=413)(scope, receive, send)
+                return
+            except Exception:
+                await JSONResponse({"detail": "Unsupported or corrupt request body"}, status_code=415)(scope, receive, send)
+                return
+
+        wants_msgpack = _wants_msgpack(headers)
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""))
+        if scope["method"] == "HEAD" or (not wants_msgpack and encoding is None):
+            await self.app(scope, receive, send)
+            return
+
+        responder = _EncodingResponder(send, wants_msgpack, encoding, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+    async def _decode_request(self, scope, receive, content_encoding: str, request_msgpack: bool):
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_DECODED_BODY:
+                raise BodyTooLarge()
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+        # Descompressão e msgpack são CPU: fora do event loop
+        body = await run_in_threadpool(_decode_body, b"".join(chunks), content_encoding, request_msgpack)
+
+        raw_headers = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length", b"content-type")
+        ]
+        raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        content_type = b"application/json" if request_msgpack else Headers(scope=scope).get("content-type", "").encode("latin-1")
+        if content_type:
+            raw_headers.append((b"content-type", content_type))
+        scope = dict(scope, headers=raw_headers)
+
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return scope, replay
+
+
+class _EncodingResponder:
+    def __init__(self, send, wants_msgpack: bool, encoding: Optional[str], minimum_size: int) -> None:
+        self.send = send
+        self.wants_msgpack = wants_msgpack
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.mode = "passthrough"  # passthrough | buffer | stream
+        self.buffer: List[bytes] = []
+        self.compressor: Optional[_Compressor] = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            length = headers.get("content-length")
+            bodyless = message["status"] < 200 or message["status"] in BODYLESS_STATUS
+            if bodyless or content_type.startswith("text/event-stream") or "content-encoding" in headers:
+                self.mode = "passthrough"
+            elif self.wants_msgpack and content_type.startswith("application/json"):
+                self.mode = "buffer"
+            elif self.encoding and (length is None or int(length) >= self.minimum_size):
+                self.mode = "stream"
+            if self.mode == "passthrough":
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.mode == "passthrough":
+            await self.send(message)
+        elif self.mode == "buffer":
+            self.buffer.append(body)
+            if not more_body:
+                await self._send_buffered()
+        else:
+            if self.compressor is None:
+                self.compressor = _Compressor(self.encoding)
+                await self.send(self._start_message(self.encoding, None))
+            data = self.compressor.compress(body)
+            if not more_body:
+                data += self.compressor.finish()
+            if data or not more_body:
+                await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _send_buffered(self) -> None:
+        body = b"".join(self.buffer)
+        content_type = None
+        if body:
+            body = msgpack.packb(json.loads(body), use_bin_type=True)
+            content_type = "application/msgpack"
+        encoding = self.encoding if self.encoding and len(body) >= self.minimum_size else None
+        if encoding:
+            compressor = _Compressor(encoding)
+            body = compressor.compress(body) + compressor.finish()
+        start = self._start_message(encoding, content_type)
+        MutableHeaders(raw=start["headers"])["content-length"] = str(len(body))
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
+
+    def _start_message(self, encoding: Optional[str], content_type: Optional[str]):
+        start = dict(self.start)
+        start["headers"] = list(self.start["headers"])
+        headers = MutableHeaders(raw=start["headers"])
+        del headers["content-length"]
+        if encoding:
+            headers["content-encoding"] = encoding
+        if content_type:
+            headers["content-type"] = content_type
+        headers.add_vary_header("Accept-Encoding")
+        headers.add_vary_header("Accept")
+        return start
@@ -0,0 +1,91 @@
+"""
+Keyset pagination shared by the list endpoints. A page is ordered by a
+unique key (e.g. (created_at, id)); the cursor is the key of the last row
+served, encoded as an opaque string, and the next page starts strictly
+after it. Bodies stay plain lists; the cursor travels in X-Next-Cursor and
+a Link rel="next" header. A request with neither cursor nor limit gets the
+whole list, as before pagination: the WPF client does not follow cursors.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import bindparam, tuple_
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([_dump(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key: Sequence) -> Tuple:
+    """Decode `cursor` into values typed after the key columns."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(key):
+            raise ValueError(cursor)
+        return tuple(_load(column, value) for column, value in zip(key, values))
+    except (TypeError, ValueError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+def _load(column, value: Any) -> Any:
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def key_tuple(key: Sequence, values: Sequence):
+    """Row-value literal for `key`, bound with each column's type."""
+    return tuple_(*(bindparam(None, value, type_=column.type) for column, value in zip(key, values)))
+
+
+def page_size(cursor: Optional[str], limit: Optional[int], default: int = DEFAULT_PAGE_SIZE) -> Optional[int]:
+    """Rows per page; None (the whole list) when neither `cursor` nor `limit` was sent."""
+    if cursor is None and limit is None:
+        return None
+    return limit or default
+
+
+def keyset_page(stmt, key: Sequence, cursor: Optional[str], limit: Optional[int], descending: bool = False):
+    """Order `stmt` by `key`, start after `cursor` and fetch one extra row (all rows without `limit`)."""
+    if cursor:
+        row_key, last = tuple_(*key), key_tuple(key, decode_cursor(cursor, key))
+        stmt = stmt.where(row_key < last if descending else row_key > last)
+    order = [column.desc() for column in key] if descending else list(key)
+    stmt = stmt.order_by(*order)
+    return stmt if limit is None else stmt.limit(limit + 1)
+
+
+def split_page(rows: List, key: Sequence, limit: Optional[int]) -> Tuple[List, Optional[str]]:
+    """Trim the extra row of keyset_page and build the cursor of the next page."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(*(getattr(last, column.key) for column in key))
+
+
+def set_next_page(request: Request, response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor is None:
+        return
+    response.headers["X-Next-Cursor"] = next_cursor
+    url = request.url.include_query_params(cursor=next_cursor)
+    response.headers["Link"] = f'<{url}>; rel="next"'
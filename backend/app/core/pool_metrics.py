@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+# Quantas esperas recentes entram no cálculo de percentis
+WAIT_SAMPLES = 1024
+
+
+class PoolMetrics:
+    """Counters for one connection pool: checkout wait, occupancy and churn."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.pool: Pool | None = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self._waits.append(seconds)
+
+    def bind(self, pool: Pool) -> None:
+        self.pool = pool
+
+        @event.listens_for(pool, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, "close")
+        def _on_close(dbapi_connection, connection_record):
+            with self._lock:
+                self.closes += 1
+
+        @event.listens_for(pool, "invalidate")
+        def _on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            waits = sorted(self._waits)
+            attempts = self.checkouts + self.timeouts
+            stats = {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_avg_ms": (self.wait_total / attempts * 1000) if attempts else 0.0,
+                "checkout_wait_p95_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+                "checkout_wait_max_ms": self.wait_max * 1000,
+                "connections_opened": self.connects,
+                "connections_closed": self.closes,
+                "connections_invalidated": self.invalidations,
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            stats.update(
+                {
+                    "pool_size": pool.size(),
+                    "checked_out": pool.checkedout(),
+                    "checked_in": pool.checkedin(),
+                    "overflow": max(0, pool.overflow()),
+                }
+            )
+        return stats
+
+
+class _TimedCheckoutMixin:
+    """Measures how long each checkout waited for a free connection."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def instrumented_pool_class(base: type, metrics: PoolMetrics) -> type:
+    """Subclass of the QueuePool `base` that reports checkout waits to `metrics`."""
+    return type(f"Instrumented{base.__name__}", (_TimedCheckoutMixin, base), {"metrics": metrics})
+
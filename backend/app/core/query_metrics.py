@@ -0,0 +1,213 @@
+"""
+Per-request SQL instrumentation. Engine events record every statement and
+commit into the current request's RequestQueries (kept in a contextvar,
+which Starlette copies into the threadpool). QueryMetricsMiddleware opens
+one per request, reports it in a Server-Timing header, aggregates it per
+route for /metrics and logs slow or query-heavy requests with their
+statement fingerprints.
+"""
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger("app.sql")
+
+# Requisições mais lentas que isso (ms) vão para o log com os fingerprints
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# ... ou com mais queries que isso (pega 1+N)
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))
+# Fingerprints distintos guardados por requisição
+MAX_FINGERPRINTS = 20
+
+_current: contextvars.ContextVar[Optional["RequestQueries"]] = contextvars.ContextVar("request_queries", default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|:\w+|\$\d+|\?")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement with literals and parameters replaced by '?', lists collapsed."""
+    text = _LITERALS.sub("?", statement)
+    text = _LISTS.sub("(?, ...)", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class RequestQueries:
+    def __init__(self) -> None:
+        self.count = 0
+        self.commits = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = ""
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.db_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+        if statement in self.statements or len(self.statements) < MAX_FINGERPRINTS:
+            self.statements[statement] += 1
+
+    def fingerprints(self) -> List[Tuple[str, int]]:
+        counted: Counter = Counter()
+        for statement, times in self.statements.items():
+            counted[fingerprint(statement)] += times
+        return counted.most_common()
+
+
+def instrument_engine(engine) -> None:
+    """Attach the statement/commit hooks to a (sync) Engine."""
+
+    # O início fica no contexto da execução, não numa pilha da conexão: uma
+    # instrução que falha não passa pelo after_cursor_execute.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_started", None)
+        if started is None:
+            return
+        current = _current.get()
+        if current is not None:
+            current.record(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        current = _current.get()
+        if current is not None:
+            current.commits += 1
+
+
+class RouteStats:
+    __slots__ = ("requests", "errors", "seconds", "queries", "db_seconds", "commits", "slow")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.commits = 0
+        self.slow = 0
+
+
+class QueryMetricsRegistry:
+    """Totals per (method, route template), rendered in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, queries: RequestQueries, slow: bool) -> None:
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats()
+            stats.requests += 1
+            stats.errors += status >= 500
+            stats.seconds += seconds
+            stats.queries += queries.count
+            stats.db_seconds += queries.db_seconds
+            stats.commits += queries.commits
+            stats.slow += slow
+
+    def render(self) -> str:
+        metrics = (
+            ("http_requests_total", "counter", "Requests served", "requests"),
+            ("http_request_errors_total", "counter", "Requests answered with 5xx", "errors"),
+            ("http_request_seconds_total", "counter", "Time spent serving requests", "seconds"),
+            ("db_queries_total", "counter", "SQL statements executed", "queries"),
+            ("db_query_seconds_total", "counter", "Time spent in SQL statements", "db_seconds"),
+            ("db_commits_total", "counter", "Transactions committed", "commits"),
+            ("http_slow_requests_total", "counter", "Requests over the slow thresholds", "slow"),
+        )
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+            for name, kind, help_text, attr in metrics:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (method, route), stats in routes:
+                    lines.append(f'{name}{{method="{method}",route="{route}"}} {getattr(stats, attr)}')
+        return "\n".join(lines) + "\n"
+
+
+registry = QueryMetricsRegistry()
+
+
+def _server_timing(queries: RequestQueries, seconds: float) -> str:
+    return ", ".join(
+        (
+            f'db;dur={queries.db_seconds * 1000:.1f};desc="{queries.count} queries, {queries.commits} commits"',
+            f"db-slowest;dur={queries.slowest_seconds * 1000:.1f}",
+            f"app;dur={seconds * 1000:.1f}",
+        )
+    )
+
+
+class QueryMetricsMiddleware:
+    """
+    Opens a RequestQueries per HTTP request. Server-Timing reflects the
+    statements run before the response started; statements of a streamed
+    body still count in /metrics and in the slow-request log.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = _current.set(queries)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def timed_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", _server_timing(queries, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _current.reset(token)
+            self._finish(scope, status_code, time.perf_counter() - started, queries)
+
+    def _finish(self, scope, status_code: int, seconds: float, queries: RequestQueries) -> None:
+        route = scope.get("route")
+        template = getattr(route, "path", None) or "unmatched"
+        slow = seconds * 1000 >= SLOW_REQUEST_MS or queries.count >= SLOW_REQUEST_QUERIES
+        registry.observe(scope["method"], template, status_code, seconds, queries, slow)
+        if slow:
+            logger.warning(
+                "slow request %s %s: %.1f ms, %d queries (%.1f ms db), %d commits; slowest %.1f ms: %s; fingerprints: %s",
+                scope["method"],
+                scope["path"],
+                seconds * 1000,
+                queries.count,
+                queries.db_seconds * 1000,
+                queries.commits,
+                queries.slowest_seconds * 1000,
+                fingerprint(queries.slowest_statement),
+                "; ".join(f"{times}x {text}" for text, times in queries.fingerprints()),
+            )
@@ -0,0 +1,332 @@
+"""
+Admission control in front of the routes: token buckets per client (user,
+IP or group) with a budget per rule, and caps on how many requests of an
+expensive rule run at once. Rejections are 429 with Retry-After and happen
+before the body is read or a worker thread is taken. Buckets live in
+process memory or in a shared store (redis) so every worker sees the same
+budget; concurrency caps are always per process.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import JSONResponse
+
+from app.core.auth import token_cache
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependência opcional
+    redis = None
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+# memory | shared (redis em RATE_LIMIT_URL, ou CACHE_URL)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", os.getenv("CACHE_URL", ""))
+RATE_LIMIT_KEY_PREFIX = os.getenv("RATE_LIMIT_KEY_PREFIX", "stickycutie:rl:")
+# Buckets guardados em memória (os mais antigos saem primeiro)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Usa o primeiro IP de X-Forwarded-For (só atrás de um proxy confiável)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "").lower() in ("1", "true", "yes")
+# Regras "user" sem token: orçamento por IP, multiplicado por este fator
+RATE_LIMIT_ANONYMOUS_FACTOR = int(os.getenv("RATE_LIMIT_ANONYMOUS_FACTOR", "10"))
+CONCURRENCY_RETRY_AFTER = 1
+
+
+class Budget(NamedTuple):
+    """`requests` per `seconds`, refilled continuously; also the burst size."""
+
+    requests: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.seconds
+
+
+def parse_budget(text: str) -> Budget:
+    """'10/60' -> 10 requests per 60 seconds."""
+    requests, _, seconds = text.partition("/")
+    return Budget(int(requests), float(seconds or 1))
+
+
+class MemoryBuckets:
+    """Token buckets in a bounded dict, local to the process."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS) -> None:
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, budget: Budget, now: float) -> float:
+        """Take one token; 0 when allowed, else seconds until one is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (budget.requests, now))
+            tokens = min(budget.requests, tokens + (now - updated) * budget.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            return (1 - tokens) / budget.rate
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._buckets)
+
+
+# Mesmo algoritmo de MemoryBuckets, atômico no servidor.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class SharedBuckets:
+    """Token buckets in redis, shared by every worker process."""
+
+    def __init__(self, client, prefix: str = RATE_LIMIT_KEY_PREFIX) -> None:
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key: str, budget: Budget, now: float) -> float:
+        # O relógio é o do worker; basta que os workers estejam sincronizados.
+        return float(self._take(keys=[self.prefix + key], args=[budget.requests, budget.rate, now]))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class Rule(NamedTuple):
+    name: str
+    methods: Tuple[str, ...]
+    pattern: "re.Pattern"
+    key: str  # ip | user | group (veja client_key)
+    budget: Optional[Budget]
+    concurrency: int  # 0 = sem limite
+
+
+def _compile(template: str) -> "re.Pattern":
+    # "/groups/{group_id}/invite" -> grupos nomeados, como nas rotas
+    return re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", template) + "/?$")
+
+
+def rule(
+    name: str,
+    methods: Iterable[str],
+    templates: Iterable[str],
+    key: str,
+    budget: Optional[str] = None,
+    concurrency: int = 0,
+) -> List[Rule]:
+    """
+    Rules for `templates`, with the budget and cap overridable through
+    RATE_LIMIT_<NAME> ("10/60", "off") and CONCURRENCY_<NAME>.
+    """
+    env_budget = os.getenv(f"RATE_LIMIT_{name.upper()}", budget or "off")
+    parsed = None if env_budget == "off" else parse_budget(env_budget)
+    cap = int(os.getenv(f"CONCURRENCY_{name.upper()}", str(concurrency)))
+    return [Rule(name, tuple(methods), _compile(template), key, parsed, cap) for template in templates]
+
+
+# Orçamentos por rota. O cliente WPF consulta /sync/updates a cada 10 s e
+# agrupa edições. Nas regras "user" sem token a chave é o IP, com orçamento
+# maior: um escritório atrás de um NAT divide o mesmo bucket.
+RULES: List[Rule] = [
+    *rule("login", ["POST"], ["/auth/login"], "ip", "10/60", concurrency=16),
+    *rule("register", ["POST"], ["/users/register"], "ip", "5/60", concurrency=8),
+    *rule("invite_token", ["GET", "POST"], ["/groups/invitations/{token}", "/groups/invitations/{token}/accept"], "ip", "30/60"),
+    *rule("invite_create", ["POST"], ["/groups/{group_id}/invite"], "group", "60/60"),
+    *rule("sync_updates", ["GET"], ["/sync/updates", "/sync/changes"], "user", "60/10", concurrency=32),
+    *rule("sync_send", ["POST"], ["/sync/send", "/sync/send-batch"], "user", "100/10", concurrency=32),
+    *rule("sync_ack", ["POST"], ["/sync/ack"], "user", "60/10"),
+    *rule("notes_search", ["GET"], ["/notes/search"], "user", "30/10", concurrency=16),
+    *rule("bulk", ["POST"], ["/users/import", "/groups/{group_id}/invite/bulk"], "ip", "10/60", concurrency=2),
+]
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _token_subject(scope) -> Optional[str]:
+    # Só tokens já verificados (TokenCache): nada de decodificar o JWT aqui.
+    # Token novo ou inválido conta pelo IP até a rota o verificar.
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    user = token_cache.peek(token)
+    return str(user.id) if user is not None else None
+
+
+def client_key(kind: str, scope, params: Dict[str, str]) -> str:
+    """
+    Bucket key. "group": the group, else the authenticated user, else the IP.
+    "user": the authenticated user, else "anon:<ip>" (budget scaled by
+    RATE_LIMIT_ANONYMOUS_FACTOR), as for the WPF client polling anonymously.
+    """
+    if kind == "group":
+        group_id = params.get("group_id") or QueryParams(scope.get("query_string", b"")).get("group_id")
+        if group_id:
+            return f"group:{group_id}"
+    if kind in ("group", "user"):
+        subject = _token_subject(scope)
+        if subject:
+            return f"user:{subject}"
+    if kind == "user":
+        return f"anon:{client_ip(scope)}"
+    return f"ip:{client_ip(scope)}"
+
+
+class RateLimiter:
+    def __init__(self, backend, rules: List[Rule]) -> None:
+        self.backend = backend
+        self.rules = rules
+        self._lock = threading.Lock()
+        self._active: Dict[str, int] = {}
+        self.limited: Dict[str, int] = {}
+
+    def match(self, method: str, path: str) -> Optional[Tuple[Rule, Dict[str, str]]]:
+        for candidate in self.rules:
+            if method in candidate.methods:
+                found = candidate.pattern.match(path)
+                if found:
+                    return candidate, found.groupdict()
+        return None
+
+    def check(self, candidate: Rule, scope, params: Dict[str, str]) -> float:
+        """0 when the request may go on, else the Retry-After in seconds."""
+        if candidate.budget is None:
+            return 0.0
+        client = client_key(candidate.key, scope, params)
+        budget = candidate.budget
+        if client.startswith("anon:"):
+            budget = Budget(budget.requests * RATE_LIMIT_ANONYMOUS_FACTOR, budget.seconds)
+        key = f"{candidate.name}:{client}"
+        wait = self.backend.take(key, budget, time.time())
+        if wait > 0:
+            self._count(candidate.name)
+        return wait
+
+    def acquire(self, candidate: Rule) -> bool:
+        if candidate.concurrency <= 0:
+            return True
+        with self._lock:
+            active = self._active.get(candidate.name, 0)
+            if active >= candidate.concurrency:
+                self.limited[candidate.name] = self.limited.get(candidate.name, 0) + 1
+                return False
+            self._active[candidate.name] = active + 1
+            return True
+
+    def release(self, candidate: Rule) -> None:
+        if candidate.concurrency <= 0:
+            return
+        with self._lock:
+            self._active[candidate.name] -= 1
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.limited[name] = self.limited.get(name, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": RATE_LIMIT_ENABLED,
+                "backend": type(self.backend).__name__,
+                "keys": self.backend.size(),
+                "active": dict(self._active),
+                "limited": dict(self.limited),
+                "rules": {
+                    r.name: {
+                        "budget": f"{r.budget.requests}/{r.budget.seconds:g}" if r.budget else None,
+                        "key": r.key,
+                        "concurrency": r.concurrency or None,
+                    }
+                    for r in self.rules
+                },
+            }
+
+
+def _make_backend():
+    if RATE_LIMIT_BACKEND == "shared" and redis is not None and RATE_LIMIT_URL:
+        return SharedBuckets(redis.Redis.from_url(RATE_LIMIT_URL))
+    return MemoryBuckets()
+
+
+limiter = RateLimiter(_make_backend(), RULES)
+
+
+def too_many_requests(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Too many requests"},
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    """Applies `limiter` to matching HTTP requests; others pass untouched."""
+
+    def __init__(self, app, limiter: RateLimiter = limiter) -> None:
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        matched = self.limiter.match(scope["method"], scope["path"])
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+
+        candidate, params = matched
+        wait = self.limiter.check(candidate, scope, params)
+        if wait > 0:
+            await too_many_requests(wait)(scope, receive, send)
+            return
+        if not self.limiter.acquire(candidate):
+            await too_many_requests(CONCURRENCY_RETRY_AFTER)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(candidate)
@@ -0,0 +1,201 @@
+"""
+Full-text search over notes. The plain text of the FlowDocument XAML is
+extracted when a note is written (notes.search_text) and indexed by the
+database itself, so the index follows every write path:
+
+- Postgres: generated tsvector column notes.search_vector (title weighted
+  above the body) with a GIN index; ranking by ts_rank_cd, snippets by
+  ts_headline over the top rows only.
+- SQLite: external-content FTS5 table notes_fts kept in sync by triggers;
+  ranking by bm25, snippets by snippet().
+
+The DDL is attached to the notes table, so create_all() installs it too;
+the Alembic migration runs the same statements.
+"""
+import html
+import os
+import re
+from typing import List
+
+from sqlalchemy import DDL, Float, bindparam, column, event, func, literal_column, select, table
+
+# Configuração de texto do Postgres (stemming); precisa existir no servidor
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "portuguese")
+# Texto extraído guardado por nota (o tsvector do Postgres tem limite de 1 MB)
+SEARCH_TEXT_MAX_CHARS = int(os.getenv("SEARCH_TEXT_MAX_CHARS", "100000"))
+SNIPPET_START = "<b>"
+SNIPPET_STOP = "</b>"
+# Marcadores usados no SQL; o trecho é escapado antes de virarem <b></b>.
+_MARK_START = "\x02"
+_MARK_STOP = "\x03"
+SNIPPET_WORDS = 16
+# Peso do título em relação ao corpo no bm25 do SQLite
+SQLITE_TITLE_WEIGHT = 4.0
+
+_TAG = re.compile(r"<([^>]*)>")
+_TEXT_ATTRIBUTE = re.compile(r'\bText\s*=\s*"([^"]*)"')
+# Elementos de bloco: o texto seguinte começa em outra linha
+_BLOCK_END = re.compile(r"^/?(?:\w+:)?(?:Paragraph|ListItem|Section|TableCell|LineBreak|BlockUIContainer)\b")
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+# Controles C0 (fora \t e \n) saem do texto: incluem os marcadores do trecho
+_CONTROLS = re.compile(r"[\x00-\x08\x0b-\x1f]")
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+def extract_text(content: str | None) -> str | None:
+    """
+    Plain text of a FlowDocument (Run text and Text="..." attributes,
+    one line per block). Scans the markup with a regex instead of an XML
+    parser: no entity expansion, and broken XAML still yields its text.
+    Content that is not XAML comes back as is.
+    """
+    if not content:
+        return None
+    parts: List[str] = []
+    position = 0
+    for tag in _TAG.finditer(content):
+        parts.append(content[position : tag.start()])
+        position = tag.end()
+        inner = tag.group(1)
+        if inner.startswith(("?", "!")):
+            continue
+        for value in _TEXT_ATTRIBUTE.findall(inner):
+            parts.append(value)
+        if _BLOCK_END.match(inner) and (inner.startswith("/") or inner.endswith("/")):
+            parts.append("\n")
+    parts.append(content[position:])
+    text = _CONTROLS.sub(" ", html.unescape("".join(parts)))
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    text = "\n".join(line for line in lines if line)
+    return text[:SEARCH_TEXT_MAX_CHARS] or None
+
+
+def highlight(snippet: str | None) -> str | None:
+    """
+    Snippet as HTML: the note text is escaped (extract_text unescapes
+    entities), then the SQL markers become SNIPPET_START/SNIPPET_STOP.
+    """
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet)
+    return escaped.replace(_MARK_START, SNIPPET_START).replace(_MARK_STOP, SNIPPET_STOP)
+
+
+def query_terms(text: str) -> List[str]:
+    """Words of a user query; operators and punctuation are dropped."""
+    return _WORDS.findall(text.lower())
+
+
+def tsquery_text(terms: List[str]) -> str:
+    """All terms, the last one as a prefix ("busca enquanto digita")."""
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+
+def fts5_query(terms: List[str]) -> str:
+    return " ".join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+
+
+# DDL por dialeto; a migração executa as mesmas listas.
+POSTGRES_DDL = [
+    f"""
+    ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(search_text, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX ix_notes_search_vector ON notes USING gin (search_vector)",
+]
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE notes_fts USING fts5(
+        title, search_text, content='notes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts (rowid, title, search_text) VALUES (new.id, new.title, new.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, title, search_text)
+        VALUES ('delete', old.id, old.title, old.search_text);
+    END
+    """,
+    """
+    CREATE TRIGGER notes_fts_update AFTER UPDATE OF title, search_text ON notes BEGIN
+        INSERT INTO notes_fts (notes_fts, rowid, title, search_text)
+        VALUES ('delete', old.id, old.title, old.search_text);
+        INSERT INTO notes_fts (rowid, title, search_text) VALUES (new.id, new.title, new.search_text);
+    END
+    """,
+]
+
+SQLITE_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS notes_fts_update",
+    "DROP TRIGGER IF EXISTS notes_fts_delete",
+    "DROP TRIGGER IF EXISTS notes_fts_insert",
+    "DROP TABLE IF EXISTS notes_fts",
+]
+
+POSTGRES_DROP_DDL = [
+    "DROP INDEX IF EXISTS ix_notes_search_vector",
+    "ALTER TABLE notes DROP COLUMN IF EXISTS search_vector",
+]
+
+# Tabela FTS5 do SQLite, só para montar as consultas
+notes_fts = table("notes_fts", column("rowid"), column("title"), column("search_text"))
+
+# Objetos fora do mapeamento ORM; o autogenerate do Alembic os ignora.
+SEARCH_OBJECTS = {"search_vector", "ix_notes_search_vector", "notes_fts"}
+
+
+def install(notes_table) -> None:
+    """Run the search DDL of the dialect after `notes_table` is created."""
+    for statement in POSTGRES_DDL:
+        event.listen(notes_table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in SQLITE_DDL:
+        event.listen(notes_table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    # drop_all: a tabela FTS5 não tem FK para notes e ficaria para trás
+    for statement in SQLITE_DROP_DDL:
+        event.listen(notes_table, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def postgres_search(note, columns, group_id: int, terms: List[str], limit: int):
+    """Top `limit` matches by ts_rank_cd; ts_headline runs on those rows only."""
+    query = func.to_tsquery(SEARCH_CONFIG, bindparam("query", tsquery_text(terms)))
+    vector = literal_column("notes.search_vector")
+    rank = func.ts_rank_cd(vector, query).label("rank")
+    ranked = (
+        select(*columns, note.search_text, rank)
+        .where(note.group_id == group_id, note.deleted.is_not(True), vector.op("@@")(query))
+        .order_by(rank.desc(), note.id)
+        .limit(limit)
+        .subquery()
+    )
+    options = f'StartSel="{_MARK_START}", StopSel="{_MARK_STOP}", MaxWords={SNIPPET_WORDS}, MinWords=5, MaxFragments=1'
+    snippet = func.ts_headline(SEARCH_CONFIG, func.coalesce(ranked.c.search_text, ""), query, options)
+    return select(
+        *(ranked.c[col.key] for col in columns),
+        ranked.c.rank,
+        snippet.label("snippet"),
+    ).order_by(ranked.c.rank.desc(), ranked.c.id)
+
+
+def sqlite_search(note, columns, group_id: int, terms: List[str], limit: int):
+    # As funções do FTS5 recebem o nome da tabela como primeiro argumento.
+    fts = literal_column("notes_fts")
+    # bm25: menor é melhor; o sinal é invertido para o rank subir com a relevância
+    bm25 = func.bm25(fts, SQLITE_TITLE_WEIGHT, 1.0)
+    rank = (-bm25).cast(Float).label("rank")
+    snippet = func.snippet(fts, -1, _MARK_START, _MARK_STOP, "…", SNIPPET_WORDS).label("snippet")
+    return (
+        select(*columns, rank, snippet)
+        .select_from(notes_fts.join(note, note.id == notes_fts.c.rowid))
+        .where(fts.op("MATCH")(bindparam("query", fts5_query(terms))))
+        .where(note.group_id == group_id, note.deleted.is_not(True))
+        .order_by(bm25, note.id)
+        .limit(limit)
+    )
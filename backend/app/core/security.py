@@ -1,23 +1,126 @@
+import asyncio
 import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
 
 from jose import jwt
+from starlette.concurrency import run_in_threadpool
 from passlib.context import CryptContext
 
 SECRET_KEY = os.getenv("STICKYCUTIE_SECRET", "stickycutie-dev-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 
+# bcrypt roda num pool de processos dedicado; 0 = calcula na própria thread
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Máximo de hashes em andamento ou na fila antes de recusar com 503
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", str(max(1, PASSWORD_HASH_WORKERS) * 8)))
+PASSWORD_HASH_RETRY_AFTER = 1
+
+# Marca de senha inutilizável (contas criadas por convite); nunca passa no verify
+UNUSABLE_PASSWORD_PREFIX = "!"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE_LIMIT)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full; mapped to HTTP 503 in app.main."""
+
+    retry_after = PASSWORD_HASH_RETRY_AFTER
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        return _executor
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _run_hashing(fn, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return fn(*args)
+    if not _slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    if not hashed_password or hashed_password.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return False
+    return _run_hashing(_verify, plain_password, hashed_password)
+
+
+async def _run_hashing_async(fn, *args):
+    # Como _run_hashing, mas aguarda o pool sem ocupar thread do threadpool.
+    if PASSWORD_HASH_WORKERS <= 0:
+        return await run_in_threadpool(fn, *args)
+    if not _slots.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        return await asyncio.wrap_future(_get_executor().submit(fn, *args))
+    finally:
+        _slots.release()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password for async routes: awaits the pool without holding a thread."""
+    if not hashed_password or hashed_password.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return False
+    return await _run_hashing_async(_verify, plain_password, hashed_password)
+
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _run_hashing(_hash, password)
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password for async routes."""
+    return await _run_hashing_async(_hash, password)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash many passwords on the pool, in waves of PASSWORD_HASH_WORKERS. Waits
+    for queue slots instead of failing, and never takes more than a wave of
+    them, so logins keep their place in the queue during a bulk import.
+    """
+    if PASSWORD_HASH_WORKERS <= 0:
+        return [_hash(password) for password in passwords]
+    hashes: List[str] = []
+    wave = min(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+    for start in range(0, len(passwords), wave):
+        batch = passwords[start : start + wave]
+        for _ in batch:
+            _slots.acquire()
+        try:
+            hashes.extend(_get_executor().map(_hash, batch))
+        finally:
+            for _ in batch:
+                _slots.release()
+    return hashes
+
+
+def make_unusable_password() -> str:
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(16)
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -25,3 +128,8 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     expire = datetime.utcnow() + (expires_delta or timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """Verify signature and expiry; raises jose.JWTError when invalid."""
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
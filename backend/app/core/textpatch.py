@@ -0,0 +1,40 @@
+import hashlib
+from typing import List, Sequence, Tuple
+
+# (início, fim, texto): troca base[início:fim] por texto
+PatchOp = Tuple[int, int, str]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def apply_patch(base: str, ops: Sequence[PatchOp]) -> str:
+    """
+    Apply splice operations expressed against `base`. Operations must be
+    sorted and non-overlapping; anything else raises ValueError.
+    """
+    parts: List[str] = []
+    position = 0
+    for start, end, text in ops:
+        if start < position or end < start or end > len(base):
+            raise ValueError("invalid patch operation")
+        parts.append(base[position:start])
+        parts.append(text)
+        position = end
+    parts.append(base[position:])
+    return "".join(parts)
+
+
+def make_patch(old: str, new: str) -> List[PatchOp]:
+    """Single splice covering the changed middle of `old` (common prefix/suffix kept)."""
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+        suffix += 1
+    if prefix == len(old) == len(new):
+        return []
+    return [(prefix, len(old) - suffix, new[prefix:len(new) - suffix])]
@@ -1,20 +1,117 @@
+"""
+Bulk removal behind /admin: the full reset and the purge of one group.
+Tables are emptied children first. Sync traffic keeps running between the
+chunks, so the events that reference a chunk's notes and users (no ON
+DELETE on sync_events.note_id/user_id) are removed by foreign key in the
+same transaction as the chunk, after the rows are locked. The job in
+app.jobs.purge commits between chunks.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select, text, true, update
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+
+from app import models
+
+# Filhas antes das mães.
+RESET_TABLES = (
+    models.SyncEvent,
+    models.SyncClient,
+    models.GroupInvitation,
+    models.GroupInvitationArchive,
+    models.GroupMember,
+    models.Note,
+    models.User,
+    models.Group,
+)
 
 
-def reset_all(db: Session) -> None:
+def truncate_all(db: Session, lock_timeout_ms: int) -> None:
     """
-    Remove all records from sync_events, notes, users and groups.
-    Order matters due to foreign keys.
+    Empty every table with one TRUNCATE ... CASCADE (Postgres only). Ids
+    keep counting: a client cursor from before the reset must not match
+    new events. Fails instead of queueing behind live traffic when the
+    locks are not granted within `lock_timeout_ms`.
     """
-    statements = [
-        "DELETE FROM sync_events;",
-        "DELETE FROM notes;",
-        "DELETE FROM users;",
-        "DELETE FROM groups;",
+    db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+    names = ", ".join(model.__tablename__ for model in RESET_TABLES)
+    db.execute(text(f"TRUNCATE {names} CASCADE"))
+
+
+def reset_scopes() -> List[Tuple[type, object]]:
+    return [(model, true()) for model in RESET_TABLES]
+
+
+def group_scopes(group_id: int) -> List[Tuple[type, object]]:
+    """(model, criteria) of everything that belongs to the group, in delete order."""
+    users = select(models.User.id).where(models.User.group_id == group_id)
+    return [
+        (models.SyncEvent, models.SyncEvent.group_id == group_id),
+        (models.SyncClient, models.SyncClient.group_id == group_id),
+        (models.GroupInvitation, models.GroupInvitation.group_id == group_id),
+        (models.GroupInvitationArchive, models.GroupInvitationArchive.group_id == group_id),
+        (models.GroupMember, or_(models.GroupMember.group_id == group_id, models.GroupMember.user_id.in_(users))),
+        (models.Note, models.Note.group_id == group_id),
+        (models.User, models.User.group_id == group_id),
+        (models.Group, models.Group.id == group_id),
     ]
 
-    for stmt in statements:
-        db.execute(text(stmt))
 
-    db.commit()
+def high_water_marks(db: Session, scopes: List[Tuple[type, object]]) -> Dict[str, Optional[int]]:
+    """Highest id of each table now; rows written after this are kept."""
+    columns = [select(func.max(model.id)).scalar_subquery().label(model.__tablename__) for model, _ in scopes]
+    return dict(db.execute(select(*columns)).one()._mapping)
+
+
+def _lock(db: Session, model, criteria) -> None:
+    # FOR UPDATE (ignorado no SQLite, que já serializa as escritas): um
+    # evento novo que referencia a linha espera o fim do lote.
+    db.execute(select(model.id).where(criteria).with_for_update())
+
+
+def release_references(db: Session, notes=None, users=None) -> None:
+    """
+    Delete the events of the notes matching `notes` and unlink the users
+    matching `users` from the events that stay. Both are locked first.
+    """
+    if notes is not None:
+        _lock(db, models.Note, notes)
+        note_ids = select(models.Note.id).where(notes)
+        db.execute(
+            delete(models.SyncEvent)
+            .where(models.SyncEvent.note_id.in_(note_ids))
+            .execution_options(synchronize_session=False)
+        )
+    if users is not None:
+        _lock(db, models.User, users)
+        user_ids = select(models.User.id).where(users)
+        db.execute(
+            update(models.SyncEvent)
+            .where(models.SyncEvent.user_id.in_(user_ids))
+            .values(user_id=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _referencing_criteria(model, ids: List[int]) -> Tuple[object, object]:
+    """(notes, users) criteria of the rows deleted along with `ids`, cascades included."""
+    if model is models.Note:
+        return models.Note.id.in_(ids), None
+    if model is models.User:
+        return None, models.User.id.in_(ids)
+    if model is models.Group:
+        return models.Note.group_id.in_(ids), models.User.group_id.in_(ids)
+    return None, None
+
+
+def delete_chunk(db: Session, model, criteria, chunk: int, upto: Optional[int] = None) -> int:
+    """Delete up to `chunk` rows of `model` matching `criteria` (and id <= `upto`)."""
+    ids = select(model.id).where(criteria)
+    if upto is not None:
+        ids = ids.where(model.id <= upto)
+    ids = db.scalars(ids.order_by(model.id).limit(chunk).with_for_update()).all()
+    if not ids:
+        return 0
+    release_references(db, *_referencing_criteria(model, ids))
+    stmt = delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+    return db.execute(stmt).rowcount
@@ -1,18 +1,55 @@
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from app import models
+from app.core.cache import cache, group_key
+from app.core.pagination import DEFAULT_PAGE_SIZE, keyset_page, split_page
+from app.database import after_commit
+from app.schemas.groups import GroupResponse
+
+# Colunas de GroupResponse; as listas não carregam objetos ORM.
+GROUP_COLUMNS = (
+    models.Group.id,
+    models.Group.name,
+    models.Group.description,
+    models.Group.created_at,
+    models.Group.updated_at,
+)
+GROUP_PAGE_KEY = (models.Group.created_at, models.Group.id)
 
 
 def create_group(db: Session, name: str, description: str | None = None) -> models.Group:
     group = models.Group(name=name, description=description)
     db.add(group)
-    db.commit()
-    db.refresh(group)
+    db.flush()
+    after_commit(db, cache.invalidate, group_key(group.id))
     return group
 
 
-def list_groups(db: Session) -> list[models.Group]:
-    return db.query(models.Group).order_by(models.Group.created_at.asc()).all()
+def list_groups(
+    db: Session,
+    cursor: str | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+) -> tuple[list[GroupResponse], str | None]:
+    """One page of groups by (created_at, id), and the cursor of the next one."""
+    stmt = keyset_page(select(*GROUP_COLUMNS), GROUP_PAGE_KEY, cursor, limit)
+    rows, next_cursor = split_page(db.execute(stmt).all(), GROUP_PAGE_KEY, limit)
+    return [GroupResponse(**row._mapping) for row in rows], next_cursor
+
+
+def list_version(db: Session):
+    """(count, max(updated_at), max(id)) of groups, for the list ETag."""
+    return db.query(
+        func.count(models.Group.id),
+        func.max(models.Group.updated_at),
+        func.max(models.Group.id),
+    ).one()
+
+
+def _load_group(db: Session, group_id: int) -> GroupResponse | None:
+    row = db.execute(select(*GROUP_COLUMNS).where(models.Group.id == group_id)).first()
+    return GroupResponse(**row._mapping) if row else None
 
 
-def get_group(db: Session, group_id: int) -> models.Group | None:
-    return db.query(models.Group).filter(models.Group.id == group_id).first()
+def get_group(db: Session, group_id: int) -> GroupResponse | None:
+    """Group snapshot, read through the cache."""
+    return cache.get_or_load(group_key(group_id), lambda: _load_group(db, group_id))
@@ -1,15 +1,58 @@
+import os
 import secrets
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional, Tuple
 
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app import models
+from app.core.cache import cache, group_invitations_key, page_key
+from app.core.pagination import DEFAULT_PAGE_SIZE, keyset_page, split_page
+from app.database import after_commit, dialect_insert
+from app.schemas.invitations import GroupInviteResponse
+
+# Colunas de GroupInviteResponse mais a chave da paginação.
+INVITATION_COLUMNS = (
+    models.GroupInvitation.id,
+    models.GroupInvitation.token,
+    models.GroupInvitation.email,
+    models.GroupInvitation.status,
+    models.GroupInvitation.expires_at,
+    models.GroupInvitation.created_by_user_id,
+    models.GroupInvitation.group_id,
+    models.GroupInvitation.created_at,
+)
+INVITATION_PAGE_KEY = (models.GroupInvitation.created_at, models.GroupInvitation.id)
+
+# Sem caracteres que se confundem ao digitar (0/O, 1/I/L); só maiúsculas,
+# como o cliente envia.
+INVITE_TOKEN_ALPHABET = os.getenv("INVITE_TOKEN_ALPHABET", "ABCDEFGHJKMNPQRSTUVWXYZ23456789")
+# 31^10 ≈ 8e14 tokens: colisões ficam raras mesmo com milhões de convites
+INVITE_TOKEN_LENGTH = int(os.getenv("INVITE_TOKEN_LENGTH", "10"))
+# Hífen a cada N caracteres, só para leitura (0 = sem hífens)
+INVITE_TOKEN_GROUP = int(os.getenv("INVITE_TOKEN_GROUP", "5"))
+# Novas tentativas quando o token sorteado já existe
+INVITE_TOKEN_RETRIES = 5
+
+_TOKEN_MAX_LENGTH = models.GroupInvitation.token.type.length
+if INVITE_TOKEN_LENGTH + (INVITE_TOKEN_LENGTH - 1) // max(1, INVITE_TOKEN_GROUP) > _TOKEN_MAX_LENGTH:
+    raise ValueError(f"INVITE_TOKEN_LENGTH does not fit group_invitations.token ({_TOKEN_MAX_LENGTH})")
+if INVITE_TOKEN_ALPHABET.upper() != INVITE_TOKEN_ALPHABET or len(set(INVITE_TOKEN_ALPHABET)) < 2:
+    raise ValueError("INVITE_TOKEN_ALPHABET must have at least two distinct upper-case characters")
 
 
 def _generate_token() -> str:
-    raw = secrets.token_hex(3).upper()
-    return f"{raw[:3]}-{raw[3:]}"
+    raw = "".join(secrets.choice(INVITE_TOKEN_ALPHABET) for _ in range(INVITE_TOKEN_LENGTH))
+    if INVITE_TOKEN_GROUP <= 0:
+        return raw
+    return "-".join(raw[i : i + INVITE_TOKEN_GROUP] for i in range(0, len(raw), INVITE_TOKEN_GROUP))
+
+
+def normalize_token(token: str) -> str:
+    """Tokens are stored upper-case; lookups compare the indexed column as is."""
+    return token.strip().upper()
 
 
 def create_invitation(
@@ -19,45 +62,157 @@ def create_invitation(
     email: str | None,
     expires_in_days: int,
 ) -> models.GroupInvitation:
+    """
+    Add a pending invitation. A token that is already taken fails only the
+    savepoint around the INSERT, and the insert is retried with a new token.
+    """
     expires_at = datetime.utcnow() + timedelta(days=max(1, expires_in_days))
-    invitation = models.GroupInvitation(
-        group_id=group_id,
-        email=email.lower() if email else None,
-        token=_generate_token(),
-        status="pending",
-        expires_at=expires_at,
-        created_by_user_id=created_by_user_id,
-    )
-    db.add(invitation)
-    db.commit()
-    db.refresh(invitation)
+    for attempt in range(INVITE_TOKEN_RETRIES + 1):
+        invitation = models.GroupInvitation(
+            group_id=group_id,
+            email=email.lower() if email else None,
+            token=_generate_token(),
+            status="pending",
+            expires_at=expires_at,
+            created_by_user_id=created_by_user_id,
+        )
+        try:
+            with db.begin_nested():
+                db.add(invitation)
+            break
+        except IntegrityError:
+            if attempt == INVITE_TOKEN_RETRIES:
+                raise
+    after_commit(db, cache.invalidate_prefix, group_invitations_key(group_id))
     return invitation
 
 
-def list_invitations(db: Session, group_id: int) -> List[models.GroupInvitation]:
+def create_invitations(
+    db: Session,
+    group_id: int,
+    invitations: List[Tuple[Optional[str], Optional[int], int]],
+) -> List[dict]:
+    """
+    Insert one invitation per (email, created_by_user_id, expires_in_days)
+    with one executemany per round. Rows whose token is already taken get
+    a new token and go in the next round. Returns the inserted rows in
+    input order.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "group_id": group_id,
+            "email": email.lower() if email else None,
+            "status": "pending",
+            "expires_at": now + timedelta(days=max(1, expires_in_days)),
+            "created_by_user_id": created_by_user_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for email, created_by_user_id, expires_in_days in invitations
+    ]
+    stmt = (
+        dialect_insert(db, models.GroupInvitation)
+        .on_conflict_do_nothing(index_elements=[models.GroupInvitation.token])
+        .returning(models.GroupInvitation.token)
+    )
+    pending = rows
+    for _ in range(INVITE_TOKEN_RETRIES + 1):
+        if not pending:
+            break
+        # Tokens distintos dentro da rodada; colisões com o banco voltam na próxima.
+        tokens = set()
+        while len(tokens) < len(pending):
+            tokens.add(_generate_token())
+        for row, token in zip(pending, tokens):
+            row["token"] = token
+        inserted = set(db.scalars(stmt, pending).all())
+        pending = [row for row in pending if row["token"] not in inserted]
+    if pending:
+        raise RuntimeError("Could not draw unique invitation tokens; raise INVITE_TOKEN_LENGTH")
+    after_commit(db, cache.invalidate_prefix, group_invitations_key(group_id))
+    return rows
+
+
+def _load_invitations(
+    db: Session,
+    group_id: int,
+    cursor: str | None,
+    limit: int | None,
+) -> Tuple[List[GroupInviteResponse], str | None]:
+    stmt = keyset_page(
+        select(*INVITATION_COLUMNS).where(models.GroupInvitation.group_id == group_id),
+        INVITATION_PAGE_KEY,
+        cursor,
+        limit,
+        descending=True,
+    )
+    rows, next_cursor = split_page(db.execute(stmt).all(), INVITATION_PAGE_KEY, limit)
+    return [GroupInviteResponse(**row._mapping) for row in rows], next_cursor
+
+
+def list_invitations(
+    db: Session,
+    group_id: int,
+    cursor: str | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    version: str = "",
+) -> Tuple[List[GroupInviteResponse], str | None]:
+    """
+    One page of invitation snapshots, newest first, read through the cache
+    under the list `version` (see page_key).
+    """
+    return cache.get_or_load(
+        page_key(group_invitations_key(group_id), cursor, limit, version),
+        lambda: _load_invitations(db, group_id, cursor, limit),
+    )
+
+
+def list_version(db: Session, group_id: int):
+    """
+    (group updated_at, count, max(updated_at), max(id)) of the group's
+    invitations. The group column is NULL when the group does not exist,
+    so a removed group never matches a cached ETag.
+    """
+    group_updated_at = (
+        select(models.Group.updated_at).where(models.Group.id == group_id).scalar_subquery()
+    )
     return (
-        db.query(models.GroupInvitation)
+        db.query(
+            group_updated_at,
+            func.count(models.GroupInvitation.id),
+            func.max(models.GroupInvitation.updated_at),
+            func.max(models.GroupInvitation.id),
+        )
         .filter(models.GroupInvitation.group_id == group_id)
-        .order_by(models.GroupInvitation.created_at.desc())
-        .all()
+        .one()
     )
 
 
 def get_by_token(db: Session, token: str) -> models.GroupInvitation | None:
-    return (
-        db.query(models.GroupInvitation)
-        .filter(models.GroupInvitation.token == token.upper())
-        .first()
-    )
+    return db.scalars(
+        select(models.GroupInvitation).where(models.GroupInvitation.token == normalize_token(token))
+    ).first()
+
+
+def get_archived_by_token(db: Session, token: str) -> models.GroupInvitationArchive | None:
+    """Archived invitation with `token`; only consulted when get_by_token misses."""
+    return db.scalars(
+        select(models.GroupInvitationArchive)
+        .where(models.GroupInvitationArchive.token == normalize_token(token))
+        .order_by(models.GroupInvitationArchive.id.desc())
+    ).first()
 
 
 def revoke_invitation(db: Session, invitation: models.GroupInvitation) -> None:
     invitation.status = "revoked"
     invitation.updated_at = datetime.utcnow()
-    db.commit()
+    db.flush()
+    after_commit(db, cache.invalidate_prefix, group_invitations_key(invitation.group_id))
 
 
 def mark_accepted(db: Session, invitation: models.GroupInvitation) -> None:
     invitation.status = "accepted"
     invitation.updated_at = datetime.utcnow()
-    db.commit()
+    db.flush()
+    after_commit(db, cache.invalidate_prefix, group_invitations_key(invitation.group_id))
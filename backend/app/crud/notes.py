@@ -0,0 +1,38 @@
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core import search
+from app.schemas.notes import NoteSearchResult
+
+# Colunas da nota trazidas pela busca; o conteúdo fica no banco.
+SEARCH_COLUMNS = (
+    models.Note.id,
+    models.Note.client_note_id,
+    models.Note.title,
+    models.Note.updated_at,
+    models.Note.revision,
+)
+
+
+def search_notes(db: Session, group_id: int, text: str, limit: int) -> List[NoteSearchResult]:
+    """Best `limit` live notes of the group matching every word of `text`."""
+    terms = search.query_terms(text)
+    if not terms:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = search.postgres_search(models.Note, SEARCH_COLUMNS, group_id, terms, limit)
+    else:
+        stmt = search.sqlite_search(models.Note, SEARCH_COLUMNS, group_id, terms, limit)
+    return [
+        NoteSearchResult(
+            id=row.client_note_id,
+            title=row.title,
+            snippet=search.highlight(row.snippet),
+            rank=row.rank,
+            updated_at=int(row.updated_at.timestamp()),
+            revision=row.revision,
+        )
+        for row in db.execute(stmt)
+    ]
@@ -1,11 +1,56 @@
+import json
 from datetime import datetime, timezone
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, literal_column, select, tuple_, update
+from sqlalchemy.orm import Session, aliased
 
 from app import models
+from app.core.pagination import decode_cursor, encode_cursor, key_tuple, keyset_page
+from app.core.search import extract_text
+from app.core.textpatch import apply_patch, content_hash, make_patch
+from app.database import dialect_insert
 from app.schemas.sync import SyncSendRequest
 
+# Quantas linhas o cursor do banco entrega por vez ao montar o delta.
+EVENTS_FETCH_SIZE = 500
+
+class BatchOutcome(NamedTuple):
+    event_ids: List[Optional[int]]  # um por payload; None = não gravado
+    group_ids: Set[int]
+    rejected: Dict[int, models.Note]  # índice do payload -> nota que venceu
+    alarms: List[Tuple[int, Optional[datetime]]]  # nota gravada -> próximo disparo
+
+
+# Ordem e cursor de /sync/updates.
+UPDATES_PAGE_KEY = (models.SyncEvent.updated_at, models.SyncEvent.id)
+
+# Mesma expressão do índice único uq_notes_group_client_note_id.
+NOTE_IDENTITY = [func.coalesce(models.Note.group_id, literal_column("0")), models.Note.client_note_id]
+
+# Colunas sobrescritas quando a nota já existe no grupo.
+NOTE_UPSERT_COLUMNS = (
+    "title",
+    "content",
+    "deleted",
+    "created_by_user_id",
+    "source_user_id",
+    "updated_at",
+    "content_hash",
+    "search_text",
+)
+
+# Colunas de alarme: só entram no upsert quando o payload as traz, para que
+# clientes que não as conhecem não apaguem o alarme dos outros.
+ALARM_COLUMNS = ("alarm_at", "snooze_until")
+
+# Próximo disparo da nota: o adiamento, senão o alarme (ix_notes_alarm_fire_at).
+ALARM_FIRE_AT = func.coalesce(models.Note.snooze_until, models.Note.alarm_at)
+# Evento gravado pelo agendador de alarmes. Seu updated_at é a hora do
+# disparo, que o cliente não vê na nota; por isso ele fica fora do feed por
+# `since` e só sai em /sync/changes e /sync/stream (cursor por id).
+ALARM_EVENT = "alarm_due"
+
 
 def _to_int(value: Optional[str]) -> Optional[int]:
     if value is None:
@@ -20,65 +65,574 @@ def _to_datetime(timestamp: int) -> datetime:
     return datetime.fromtimestamp(timestamp, tz=timezone.utc)
 
 
-def upsert_note(db: Session, payload: SyncSendRequest) -> models.Note:
-    note = (
-        db.query(models.Note)
-        .filter(models.Note.geometry == payload.id)
-        .one_or_none()
+def alarm_fire_time(alarm_at, snooze_until, deleted) -> Optional[datetime]:
+    """Python side of ALARM_FIRE_AT; deleted notes never fire."""
+    if deleted:
+        return None
+    return snooze_until or alarm_at
+
+
+def _alarm_values(payload: SyncSendRequest) -> dict:
+    return {
+        column: _to_datetime(getattr(payload, column)) if getattr(payload, column) else None
+        for column in ALARM_COLUMNS
+        if column in payload.__fields_set__
+    }
+
+
+def _note_values(payload: SyncSendRequest) -> dict:
+    return {
+        "client_note_id": payload.id,
+        "title": payload.title,
+        "content": payload.content,
+        "deleted": payload.deleted,
+        "group_id": _to_int(payload.group_id),
+        "created_by_user_id": _to_int(payload.created_by_user_id),
+        "source_user_id": _to_int(payload.target_user_id),
+        "updated_at": _to_datetime(payload.updated_at),
+        "content_hash": content_hash(payload.content),
+        "search_text": extract_text(payload.content),
+        "revision": 1,
+        **_alarm_values(payload),
+    }
+
+
+def _upsert_stmt(db, alarm_columns: Tuple[str, ...] = ()):
+    stmt = dialect_insert(db, models.Note)
+    set_ = {column: stmt.excluded[column] for column in NOTE_UPSERT_COLUMNS + alarm_columns}
+    set_["revision"] = models.Note.revision + 1
+    # Último a escrever vence, decidido pelo banco na mesma instrução: só
+    # atualiza se a cópia recebida for mais nova. Empate fica com o servidor.
+    # Sem linha no RETURNING = escrita perdedora.
+    return stmt.on_conflict_do_update(
+        index_elements=NOTE_IDENTITY,
+        set_=set_,
+        where=models.Note.updated_at < stmt.excluded.updated_at,
     )
-    if note is None:
-        note = models.Note(
-            geometry=payload.id,
-        )
-        db.add(note)
-
-    note.title = payload.title
-    note.content = payload.content
-    note.deleted = payload.deleted
-    note.group_id = _to_int(payload.group_id)
-    note.created_by_user_id = _to_int(payload.created_by_user_id)
-    note.source_user_id = _to_int(payload.target_user_id)
-    note.updated_at = _to_datetime(payload.updated_at)
-    db.flush()
-    return note
 
 
-def create_sync_event(db: Session, note: models.Note, payload: SyncSendRequest) -> models.SyncEvent:
-    event = models.SyncEvent(
-        note_id=note.id,
-        user_id=_to_int(payload.created_by_user_id),
-        event_type="note",
-        updated_at=_to_datetime(payload.updated_at),
+def _note_upsert_stmt(db, payload: SyncSendRequest):
+    values = _note_values(payload)
+    alarm_columns = tuple(column for column in ALARM_COLUMNS if column in values)
+    return _upsert_stmt(db, alarm_columns).values(**values).returning(models.Note)
+
+
+def _batch_upsert_stmt(db, alarm_columns: Tuple[str, ...] = ()):
+    return _upsert_stmt(db, alarm_columns).returning(
+        models.Note.id,
+        models.Note.group_id,
+        models.Note.client_note_id,
+        models.Note.revision,
+        models.Note.alarm_at,
+        models.Note.snooze_until,
+        models.Note.deleted,
+    )
+
+
+def _batch_upserts(db, payloads: List[SyncSendRequest], ordered: List[int]) -> List[Tuple[object, List[dict]]]:
+    """
+    (statement, rows) pairs for the batch winners: one executemany per set
+    of alarm columns the payloads carry, normally a single one.
+    """
+    grouped: Dict[Tuple[str, ...], List[dict]] = {}
+    for index in ordered:
+        values = _note_values(payloads[index])
+        alarm_columns = tuple(column for column in ALARM_COLUMNS if column in values)
+        grouped.setdefault(alarm_columns, []).append(values)
+    return [(_batch_upsert_stmt(db, columns), rows) for columns, rows in grouped.items()]
+
+
+def _note_alarms(note_rows) -> List[Tuple[int, Optional[datetime]]]:
+    return [(row.id, alarm_fire_time(row.alarm_at, row.snooze_until, row.deleted)) for row in note_rows]
+
+
+def _event_insert_stmt(db):
+    return dialect_insert(db, models.SyncEvent).returning(models.SyncEvent.id, sort_by_parameter_order=True)
+
+
+def _note_key(group_id: Optional[int], client_note_id: str) -> Tuple[int, str]:
+    return (group_id or 0, client_note_id)
+
+
+def _diff_patch(previous, revision: int, content: str) -> Optional[str]:
+    """
+    Patch from the previous revision to `content` for a full-content send,
+    or None when `previous` is not the revision right before this one (a
+    concurrent write got in between) or the patch is not smaller.
+    """
+    if previous is None or previous.revision != revision - 1:
+        return None
+    patch = json.dumps(make_patch(previous.content or "", content))
+    return patch if len(patch) < len(content) else None
+
+
+def _event_values(
+    note_id: int,
+    group_id: Optional[int],
+    revision: int,
+    payload: SyncSendRequest,
+    previous=None,
+) -> dict:
+    values = {
+        "note_id": note_id,
+        "user_id": _to_int(payload.created_by_user_id),
+        "group_id": group_id,
+        "event_type": "note",
+        "updated_at": _to_datetime(payload.updated_at),
+        "revision": revision,
+    }
+    if payload.patch is not None:
+        values["base_revision"] = payload.base_revision
+        values["patch"] = json.dumps(payload.patch)
+    elif payload.content is not None:
+        # Envio completo: o servidor calcula o patch para o download
+        patch = _diff_patch(previous, revision, payload.content)
+        if patch is not None:
+            values["base_revision"] = previous.revision
+            values["patch"] = patch
+    return values
+
+
+def _stored_notes_stmt(payloads: List[SyncSendRequest]):
+    keys = {_note_key(_to_int(payload.group_id), payload.id) for payload in payloads}
+    return select(models.Note).where(tuple_(*NOTE_IDENTITY).in_(sorted(keys)))
+
+
+def _previous_contents_stmt(payloads: List[SyncSendRequest]):
+    """Revision and content of the stored notes the full-content payloads will replace."""
+    keys = {_note_key(_to_int(payload.group_id), payload.id) for payload in payloads}
+    return select(
+        models.Note.group_id, models.Note.client_note_id, models.Note.revision, models.Note.content
+    ).where(tuple_(*NOTE_IDENTITY).in_(sorted(keys)))
+
+
+def _full_content(payloads: List[SyncSendRequest], ordered: List[int]) -> List[SyncSendRequest]:
+    return [payloads[index] for index in ordered if payloads[index].content is not None]
+
+
+def _current_note_stmt(payload: SyncSendRequest):
+    return select(models.Note.id, models.Note.content, models.Note.revision).where(
+        NOTE_IDENTITY[0] == (_to_int(payload.group_id) or 0),
+        models.Note.client_note_id == payload.id,
     )
+
+
+def _patched_update_stmt(payload: SyncSendRequest, current):
+    """
+    Conditional UPDATE writing the patched content, or None when the patch
+    does not apply to the stored revision.
+    """
+    if current is None or current.revision != payload.base_revision:
+        return None
+    try:
+        content = apply_patch(current.content or "", payload.patch)
+    except ValueError:
+        return None
+    digest = content_hash(content)
+    if payload.content_hash and payload.content_hash != digest:
+        return None
+    return (
+        update(models.Note)
+        .where(
+            models.Note.id == current.id,
+            models.Note.revision == payload.base_revision,
+            # Como no upsert: uma cópia mais antiga não faz updated_at recuar
+            models.Note.updated_at < _to_datetime(payload.updated_at),
+        )
+        .values(
+            title=payload.title,
+            content=content,
+            content_hash=digest,
+            search_text=extract_text(content),
+            deleted=payload.deleted,
+            created_by_user_id=_to_int(payload.created_by_user_id),
+            source_user_id=_to_int(payload.target_user_id),
+            updated_at=_to_datetime(payload.updated_at),
+            revision=models.Note.revision + 1,
+            **_alarm_values(payload),
+        )
+        .returning(models.Note)
+    )
+
+
+def _batch_winners(payloads: List[SyncSendRequest]) -> List[int]:
+    """Indexes of the payloads that win within the batch (newest copy of each note)."""
+    winners: dict = {}
+    for index, payload in enumerate(payloads):
+        key = _note_key(_to_int(payload.group_id), payload.id)
+        current = winners.get(key)
+        if current is None or payloads[current].updated_at <= payload.updated_at:
+            winners[key] = index
+    return sorted(winners.values())
+
+
+def _batch_event_rows(
+    payloads: List[SyncSendRequest],
+    ordered: List[int],
+    note_rows,
+    previous_rows=(),
+) -> Tuple[List[int], List[dict], List[int]]:
+    """
+    Split the batch winners into the ones the upsert applied, with their
+    event rows, and the ones it rejected as older than the stored note.
+    `previous_rows` are the notes as they were before the upsert.
+    """
+    notes = {_note_key(row.group_id, row.client_note_id): row for row in note_rows}
+    previous = {_note_key(row.group_id, row.client_note_id): row for row in previous_rows}
+    applied, event_rows, rejected = [], [], []
+    for index in ordered:
+        payload = payloads[index]
+        row = notes.get(_note_key(_to_int(payload.group_id), payload.id))
+        if row is None:
+            rejected.append(index)
+            continue
+        applied.append(index)
+        key = _note_key(row.group_id, row.client_note_id)
+        event_rows.append(_event_values(row.id, row.group_id, row.revision, payload, previous.get(key)))
+    return applied, event_rows, rejected
+
+
+def _batch_results(
+    payloads: List[SyncSendRequest],
+    applied: List[int],
+    event_ids: List[int],
+    event_rows: List[dict],
+    rejected: List[int],
+    stored: List[models.Note],
+    alarms: List[Tuple[int, Optional[datetime]]],
+) -> BatchOutcome:
+    event_by_index: List[Optional[int]] = [None] * len(payloads)
+    for index, event_id in zip(applied, event_ids):
+        event_by_index[index] = event_id
+    notes = {_note_key(note.group_id, note.client_note_id): note for note in stored}
+    rejected_notes = {}
+    for index in rejected:
+        payload = payloads[index]
+        rejected_notes[index] = notes[_note_key(_to_int(payload.group_id), payload.id)]
+    group_ids = {row["group_id"] for row in event_rows if row["group_id"] is not None}
+    return BatchOutcome(event_by_index, group_ids, rejected_notes, alarms)
+
+
+def upsert_note(db: Session, payload: SyncSendRequest) -> Optional[models.Note]:
+    """
+    Insert or update the note identified by (group_id, client_note_id) in a
+    single INSERT ... ON CONFLICT DO UPDATE ... WHERE ... RETURNING statement.
+    Returns None when the stored note is as new or newer than the payload;
+    get_note then gives the version that won.
+    """
+    stmt = _note_upsert_stmt(db, payload)
+    return db.scalars(stmt, execution_options={"populate_existing": True}).one_or_none()
+
+
+def get_note(db: Session, payload: SyncSendRequest) -> Optional[models.Note]:
+    return db.scalars(_stored_notes_stmt([payload])).one_or_none()
+
+
+def get_previous_content(db: Session, payload: SyncSendRequest):
+    """Stored (revision, content) a full-content send is about to replace; see create_sync_event."""
+    if payload.content is None:
+        return None
+    return db.execute(_previous_contents_stmt([payload])).one_or_none()
+
+
+def apply_note_patch(db: Session, payload: SyncSendRequest) -> Optional[models.Note]:
+    """
+    Apply `payload.patch` to the stored note if it is still at
+    `payload.base_revision`. Returns None when the base is missing or stale,
+    in which case the client must resend the full content.
+    """
+    current = db.execute(_current_note_stmt(payload)).one_or_none()
+    stmt = _patched_update_stmt(payload, current)
+    if stmt is None:
+        return None
+    return db.scalars(stmt, execution_options={"populate_existing": True}).one_or_none()
+
+
+def send_batch(db: Session, payloads: List[SyncSendRequest]) -> BatchOutcome:
+    """
+    Upsert many notes and record their sync events with one bulk upsert
+    and one bulk event insert (the caller commits). The outcome holds the event
+    id of each payload, in order (None for a payload superseded within the
+    batch or rejected by the stored note), the groups that received events,
+    the stored note that beat each rejected payload and the next fire time
+    of each written note.
+    """
+    ordered = _batch_winners(payloads)
+    if not ordered:
+        return BatchOutcome([], set(), {}, [])
+
+    full = _full_content(payloads, ordered)
+    previous_rows = db.execute(_previous_contents_stmt(full)).all() if full else []
+    note_rows = []
+    for stmt, rows in _batch_upserts(db, payloads, ordered):
+        note_rows.extend(db.execute(stmt, rows).all())
+    applied, event_rows, rejected = _batch_event_rows(payloads, ordered, note_rows, previous_rows)
+    event_ids = db.scalars(_event_insert_stmt(db), event_rows).all() if event_rows else []
+    stored = db.scalars(_stored_notes_stmt([payloads[i] for i in rejected])).all() if rejected else []
+    return _batch_results(payloads, applied, event_ids, event_rows, rejected, stored, _note_alarms(note_rows))
+
+
+def create_sync_event(db: Session, note: models.Note, payload: SyncSendRequest, previous=None) -> models.SyncEvent:
+    """
+    Record the event of a written note. With `previous` (get_previous_content,
+    read before the upsert) a full-content send also gets a server-side patch.
+    """
+    event = models.SyncEvent(**_event_values(note.id, note.group_id, note.revision, payload, previous))
     db.add(event)
-    db.commit()
-    db.refresh(event)
+    db.flush()
     return event
 
 
-def get_events_since(db: Session, since: datetime) -> List[models.SyncEvent]:
+def _latest_events(*criteria):
+    """Newest event id of each note matching `criteria`."""
+    return select(func.max(models.SyncEvent.id).label("id")).where(*criteria).group_by(models.SyncEvent.note_id)
+
+
+def _base_event_id():
+    """
+    Id of the last event that left the note at the row's base_revision;
+    NULL without a patch or once compaction removed that event.
+    """
+    base = aliased(models.SyncEvent)
+    previous = (
+        select(func.max(base.id))
+        .where(
+            base.note_id == models.SyncEvent.note_id,
+            base.id < models.SyncEvent.id,
+            base.revision == models.SyncEvent.base_revision,
+        )
+        .scalar_subquery()
+    )
+    return case((models.SyncEvent.patch.is_(None), None), else_=previous).label("base_event_id")
+
+
+def _events_with_notes(latest):
     return (
-        db.query(models.SyncEvent)
-        .filter(models.SyncEvent.updated_at > since)
-        .order_by(models.SyncEvent.updated_at.asc())
-        .all()
+        select(models.SyncEvent, models.Note, _base_event_id())
+        .join(latest, latest.c.id == models.SyncEvent.id)
+        .join(models.Note, models.Note.id == models.SyncEvent.note_id)
+    )
+
+
+def _since_criteria(since: datetime, group_id: Optional[int]):
+    criteria = [
+        models.SyncEvent.updated_at > since,
+        models.SyncEvent.event_type.is_distinct_from(ALARM_EVENT),
+    ]
+    if group_id is not None:
+        criteria.append(models.SyncEvent.group_id == group_id)
+    return criteria
+
+
+def events_since_query(
+    since: datetime,
+    group_id: Optional[int] = None,
+    after: Optional[Tuple] = None,
+    through: Optional[Tuple] = None,
+):
+    latest = _latest_events(*_since_criteria(since, group_id)).subquery()
+    stmt = _events_with_notes(latest)
+    row_key = tuple_(*UPDATES_PAGE_KEY)
+    if after is not None:
+        stmt = stmt.where(row_key > key_tuple(UPDATES_PAGE_KEY, after))
+    if through is not None:
+        stmt = stmt.where(row_key <= key_tuple(UPDATES_PAGE_KEY, through))
+    return stmt.order_by(*UPDATES_PAGE_KEY).execution_options(yield_per=EVENTS_FETCH_SIZE)
+
+
+def updates_page_query(since: datetime, group_id: Optional[int], cursor: Optional[str], limit: int):
+    """Only the (updated_at, id) keys of one /sync/updates page."""
+    latest = _latest_events(*_since_criteria(since, group_id)).subquery()
+    stmt = select(*UPDATES_PAGE_KEY).join(latest, latest.c.id == models.SyncEvent.id)
+    return keyset_page(stmt, UPDATES_PAGE_KEY, cursor, limit)
+
+
+def updates_tie_end_query(since: datetime, group_id: Optional[int], updated_at: datetime):
+    """Key of the last /sync/updates row at `updated_at` (the end of a tie)."""
+    latest = _latest_events(*_since_criteria(since, group_id)).subquery()
+    return (
+        select(*UPDATES_PAGE_KEY)
+        .join(latest, latest.c.id == models.SyncEvent.id)
+        .where(models.SyncEvent.updated_at == updated_at)
+        .order_by(models.SyncEvent.id.desc())
+        .limit(1)
+    )
+
+
+def _trim_updates_page(rows, limit: int):
+    """
+    Cut a full page before the updated_at it would split: clients that
+    resume with since = the last updated_at (strictly greater) would lose
+    the rest of the tie. Returns (rows, has_more, tie); `tie` is set when
+    the whole page is one updated_at, and the page must run to its end.
+    """
+    if len(rows) <= limit:
+        return rows, False, None
+    boundary = rows[limit].updated_at
+    page = rows[:limit]
+    if page[-1].updated_at != boundary:
+        return page, True, None
+    page = [row for row in page if row.updated_at != boundary]
+    return page, True, (None if page else boundary)
+
+
+def _updates_page_bounds(rows, cursor: Optional[str], has_more: bool):
+    after = decode_cursor(cursor, UPDATES_PAGE_KEY) if cursor else None
+    through = tuple(rows[-1]) if rows else None
+    next_cursor = encode_cursor(*through) if has_more and through else None
+    return after, through, next_cursor
+
+
+def updates_version_query(since: datetime, group_id: Optional[int] = None):
+    """(count, max(id), max(updated_at)) of the events /sync/updates would scan."""
+    return select(
+        func.count(models.SyncEvent.id),
+        func.max(models.SyncEvent.id),
+        func.max(models.SyncEvent.updated_at),
+    ).where(*_since_criteria(since, group_id))
+
+
+def changes_query(group_id: int, cursor: int, limit: int):
+    latest = (
+        _latest_events(
+            models.SyncEvent.group_id == group_id,
+            models.SyncEvent.id > cursor,
+        )
+        .order_by(func.max(models.SyncEvent.id).asc())
+        .limit(limit + 1)
+        .subquery()
     )
+    return _events_with_notes(latest).order_by(models.SyncEvent.id.asc())
+
+
+def get_updates_page(
+    db: Session,
+    since: datetime,
+    group_id: Optional[int],
+    cursor: Optional[str],
+    limit: int,
+) -> Tuple[Optional[Tuple], Optional[Tuple], Optional[str]]:
+    """
+    Bounds of one /sync/updates page as (after, through, next_cursor) keys.
+    Only the keys are read here; get_events_since then streams the rows
+    between them, so neither step holds more than `limit` small tuples.
+    A page never ends inside an updated_at tie (_trim_updates_page); one
+    made of a single tie runs past `limit` to the tie's end. `through` is
+    None when the page is empty.
+    """
+    rows = db.execute(updates_page_query(since, group_id, cursor, limit)).all()
+    rows, has_more, tie = _trim_updates_page(rows, limit)
+    if tie is not None:
+        rows = db.execute(updates_tie_end_query(since, group_id, tie)).all()
+    return _updates_page_bounds(rows, cursor, has_more)
+
+
+def get_events_since(
+    db: Session,
+    since: datetime,
+    group_id: Optional[int] = None,
+    after: Optional[Tuple] = None,
+    through: Optional[Tuple] = None,
+) -> Iterator[Tuple[models.SyncEvent, models.Note, Optional[int]]]:
+    """
+    Return (event, note, base_event_id) rows newer than `since` in a single
+    joined query; see _base_event_id. Only the latest event of each note is
+    kept; rows are streamed from the cursor in batches instead of being
+    materialized all at once.
+    """
+    return db.execute(events_since_query(since, group_id, after, through)).tuples()
+
+
+def get_updates_version(db: Session, since: datetime, group_id: Optional[int] = None):
+    return db.execute(updates_version_query(since, group_id)).one()
+
+
+def get_changes(
+    db: Session,
+    group_id: int,
+    cursor: int,
+    limit: int,
+) -> Tuple[List[Tuple[models.SyncEvent, models.Note, Optional[int]]], bool]:
+    """
+    One page of the group's change feed after `cursor` (a sync_events id).
+    Each note shows up once, at its latest event, so the page never carries
+    superseded versions. Returns the page and whether more rows follow.
+    """
+    rows = db.execute(changes_query(group_id, cursor, limit)).tuples().all()
+    return rows[:limit], len(rows) > limit
+
 
+def client_watermark_stmt(client_id: str):
+    return select(models.SyncClient.acked_event_id).where(models.SyncClient.client_id == client_id)
 
-def delete_events(db: Session, event_ids: Iterable[str]) -> int:
+
+def get_client_watermark(db: Session, client_id: str) -> Optional[int]:
+    """Highest event id the client acknowledged, or None for an unknown client."""
+    return db.scalar(client_watermark_stmt(client_id))
+
+
+def _parse_event_ids(event_ids: Iterable[str]) -> List[int]:
     ids: List[int] = []
     for eid in event_ids:
         try:
             ids.append(int(eid))
         except (TypeError, ValueError):
             continue
-    if not ids:
-        return 0
+    return ids
 
-    deleted = (
-        db.query(models.SyncEvent)
-        .filter(models.SyncEvent.id.in_(ids))
-        .delete(synchronize_session=False)
+
+def _acked_event_stmt(ids: List[int], group_id: Optional[int]):
+    # Só ids que existem contam para o watermark; o grupo vem do evento
+    # quando o chamador não é identificado.
+    stmt = select(models.SyncEvent.id, models.SyncEvent.group_id).where(models.SyncEvent.id.in_(ids))
+    if group_id is not None:
+        stmt = stmt.where(models.SyncEvent.group_id == group_id)
+    return stmt.order_by(models.SyncEvent.id.desc()).limit(1)
+
+
+def _ack_stmt(db, client_id: str, user_id: Optional[int], group_id: Optional[int], event_id: int):
+    stmt = dialect_insert(db, models.SyncClient).values(
+        client_id=client_id,
+        user_id=user_id,
+        group_id=group_id,
+        acked_event_id=event_id,
+        last_seen_at=datetime.utcnow(),
+    )
+    current = models.SyncClient.acked_event_id
+    # O watermark só avança: acks atrasados ou repetidos não o fazem recuar.
+    set_ = {
+        "acked_event_id": case((stmt.excluded.acked_event_id > current, stmt.excluded.acked_event_id), else_=current),
+        "last_seen_at": stmt.excluded.last_seen_at,
+        "user_id": func.coalesce(stmt.excluded.user_id, models.SyncClient.user_id),
+        "group_id": func.coalesce(stmt.excluded.group_id, models.SyncClient.group_id),
+    }
+    return stmt.on_conflict_do_update(index_elements=[models.SyncClient.client_id], set_=set_).returning(
+        models.SyncClient.acked_event_id
     )
-    db.commit()
-    return deleted
+
+
+def record_ack(
+    db: Session,
+    client_id: str,
+    event_ids: Iterable[str],
+    user_id: Optional[int] = None,
+    group_id: Optional[int] = None,
+) -> Optional[int]:
+    """
+    Advance the client's delivery watermark to the highest acknowledged
+    event. Events are left in place; the compaction job reclaims them once
+    every client of the group is past them. Returns the stored watermark.
+    """
+    ids = _parse_event_ids(event_ids)
+    if not ids:
+        return None
+
+    acked = db.execute(_acked_event_stmt(ids, group_id)).one_or_none()
+    if acked is None:
+        return None
+
+    event_id, event_group_id = acked
+    watermark = db.execute(
+        _ack_stmt(db, client_id, user_id, group_id if group_id is not None else event_group_id, event_id)
+    ).scalar_one()
+    return watermark
@@ -0,0 +1,157 @@
+"""
+AsyncSession versions of the app.crud.sync operations, used when
+DATABASE_ASYNC is on. They run exactly the statements built in
+app.crud.sync, so both modes return the same rows.
+"""
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.crud.sync import (
+    BatchOutcome,
+    _ack_stmt,
+    _acked_event_stmt,
+    _batch_event_rows,
+    _batch_results,
+    _batch_upserts,
+    _batch_winners,
+    _current_note_stmt,
+    _event_insert_stmt,
+    _event_values,
+    _full_content,
+    _note_alarms,
+    _note_upsert_stmt,
+    _parse_event_ids,
+    _patched_update_stmt,
+    _previous_contents_stmt,
+    _stored_notes_stmt,
+    _trim_updates_page,
+    _updates_page_bounds,
+    changes_query,
+    client_watermark_stmt,
+    events_since_query,
+    updates_page_query,
+    updates_tie_end_query,
+    updates_version_query,
+)
+from app.schemas.sync import SyncSendRequest
+
+
+async def upsert_note(db: AsyncSession, payload: SyncSendRequest) -> Optional[models.Note]:
+    stmt = _note_upsert_stmt(db, payload)
+    result = await db.scalars(stmt, execution_options={"populate_existing": True})
+    return result.one_or_none()
+
+
+async def get_note(db: AsyncSession, payload: SyncSendRequest) -> Optional[models.Note]:
+    return (await db.scalars(_stored_notes_stmt([payload]))).one_or_none()
+
+
+async def get_previous_content(db: AsyncSession, payload: SyncSendRequest):
+    if payload.content is None:
+        return None
+    return (await db.execute(_previous_contents_stmt([payload]))).one_or_none()
+
+
+async def apply_note_patch(db: AsyncSession, payload: SyncSendRequest) -> Optional[models.Note]:
+    current = (await db.execute(_current_note_stmt(payload))).one_or_none()
+    stmt = _patched_update_stmt(payload, current)
+    if stmt is None:
+        return None
+    result = await db.scalars(stmt, execution_options={"populate_existing": True})
+    return result.one_or_none()
+
+
+async def send_batch(db: AsyncSession, payloads: List[SyncSendRequest]) -> BatchOutcome:
+    ordered = _batch_winners(payloads)
+    if not ordered:
+        return BatchOutcome([], set(), {}, [])
+
+    full = _full_content(payloads, ordered)
+    previous_rows = (await db.execute(_previous_contents_stmt(full))).all() if full else []
+    note_rows = []
+    for stmt, rows in _batch_upserts(db, payloads, ordered):
+        note_rows.extend((await db.execute(stmt, rows)).all())
+    applied, event_rows, rejected = _batch_event_rows(payloads, ordered, note_rows, previous_rows)
+    event_ids = (await db.scalars(_event_insert_stmt(db), event_rows)).all() if event_rows else []
+    stored = []
+    if rejected:
+        stored = (await db.scalars(_stored_notes_stmt([payloads[i] for i in rejected]))).all()
+    return _batch_results(payloads, applied, event_ids, event_rows, rejected, stored, _note_alarms(note_rows))
+
+
+async def create_sync_event(
+    db: AsyncSession, note: models.Note, payload: SyncSendRequest, previous=None
+) -> models.SyncEvent:
+    event = models.SyncEvent(**_event_values(note.id, note.group_id, note.revision, payload, previous))
+    db.add(event)
+    await db.flush()
+    return event
+
+
+async def get_updates_page(
+    db: AsyncSession,
+    since: datetime,
+    group_id: Optional[int],
+    cursor: Optional[str],
+    limit: int,
+) -> Tuple[Optional[Tuple], Optional[Tuple], Optional[str]]:
+    rows = (await db.execute(updates_page_query(since, group_id, cursor, limit))).all()
+    rows, has_more, tie = _trim_updates_page(rows, limit)
+    if tie is not None:
+        rows = (await db.execute(updates_tie_end_query(since, group_id, tie))).all()
+    return _updates_page_bounds(rows, cursor, has_more)
+
+
+async def get_events_since(
+    db: AsyncSession,
+    since: datetime,
+    group_id: Optional[int] = None,
+    after: Optional[Tuple] = None,
+    through: Optional[Tuple] = None,
+) -> AsyncIterator[Tuple[models.SyncEvent, models.Note, Optional[int]]]:
+    result = await db.stream(events_since_query(since, group_id, after, through))
+    async for row in result.tuples():
+        yield row
+
+
+async def get_updates_version(db: AsyncSession, since: datetime, group_id: Optional[int] = None):
+    return (await db.execute(updates_version_query(since, group_id))).one()
+
+
+async def get_changes(
+    db: AsyncSession,
+    group_id: int,
+    cursor: int,
+    limit: int,
+) -> Tuple[List[Tuple[models.SyncEvent, models.Note, Optional[int]]], bool]:
+    rows = (await db.execute(changes_query(group_id, cursor, limit))).tuples().all()
+    return rows[:limit], len(rows) > limit
+
+
+async def get_client_watermark(db: AsyncSession, client_id: str) -> Optional[int]:
+    return await db.scalar(client_watermark_stmt(client_id))
+
+
+async def record_ack(
+    db: AsyncSession,
+    client_id: str,
+    event_ids: Iterable[str],
+    user_id: Optional[int] = None,
+    group_id: Optional[int] = None,
+) -> Optional[int]:
+    ids = _parse_event_ids(event_ids)
+    if not ids:
+        return None
+
+    acked = (await db.execute(_acked_event_stmt(ids, group_id))).one_or_none()
+    if acked is None:
+        return None
+
+    event_id, event_group_id = acked
+    result = await db.execute(
+        _ack_stmt(db, client_id, user_id, group_id if group_id is not None else event_group_id, event_id)
+    )
+    return result.scalar_one()
@@ -1,13 +1,76 @@
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import func, inspect, select
 from sqlalchemy.orm import Session
 from app import models
+from app.core.cache import cache, group_users_key, page_key
+from app.core.pagination import DEFAULT_PAGE_SIZE, keyset_page, split_page
+from app.database import after_commit, dialect_insert
+from app.schemas.users import UserResponse
+
+# Colunas de UserResponse; password_hash nunca sai do banco nas listas.
+USER_COLUMNS = (
+    models.User.id,
+    models.User.group_id,
+    models.User.name,
+    models.User.email,
+    models.User.phone,
+    models.User.is_admin,
+    models.User.created_at,
+    models.User.updated_at,
+)
+USER_PAGE_KEY = (models.User.created_at, models.User.id)
+
+
+def _load_users_by_group(
+    db: Session,
+    group_id: int,
+    cursor: str | None,
+    limit: int | None,
+) -> tuple[list[UserResponse], str | None]:
+    stmt = keyset_page(
+        select(*USER_COLUMNS).where(models.User.group_id == group_id),
+        USER_PAGE_KEY,
+        cursor,
+        limit,
+    )
+    rows, next_cursor = split_page(db.execute(stmt).all(), USER_PAGE_KEY, limit)
+    return [UserResponse(**row._mapping) for row in rows], next_cursor
+
+
+def list_users_by_group(
+    db: Session,
+    group_id: int,
+    cursor: str | None = None,
+    limit: int | None = DEFAULT_PAGE_SIZE,
+    version: str = "",
+) -> tuple[list[UserResponse], str | None]:
+    """
+    One page of member snapshots by (created_at, id), read through the
+    cache under the list `version` (see page_key).
+    """
+    return cache.get_or_load(
+        page_key(group_users_key(group_id), cursor, limit, version),
+        lambda: _load_users_by_group(db, group_id, cursor, limit),
+    )
 
 
-def list_users_by_group(db: Session, group_id: int):
+def _invalidate_members(*group_ids) -> None:
+    for group_id in set(group_ids):
+        if group_id is not None:
+            cache.invalidate_prefix(group_users_key(group_id))
+
+
+def group_version(db: Session, group_id: int):
+    """(count, max(updated_at), max(id)) of the group's users, for the list ETag."""
     return (
-        db.query(models.User)
+        db.query(
+            func.count(models.User.id),
+            func.max(models.User.updated_at),
+            func.max(models.User.id),
+        )
         .filter(models.User.group_id == group_id)
-        .order_by(models.User.created_at.asc())
-        .all()
+        .one()
     )
 
 
@@ -16,12 +79,40 @@ def get_user(db: Session, user_id: int) -> models.User | None:
 
 
 def delete_user(db: Session, user: models.User):
+    group_id = user.group_id
     db.delete(user)
-    db.commit()
+    db.flush()
+    after_commit(db, _invalidate_members, group_id)
+
+
+def existing_emails(db: Session, emails: Iterable[str]) -> Set[str]:
+    """Which of `emails` (lowercase) are already registered, in one query."""
+    emails = list(emails)
+    if not emails:
+        return set()
+    return set(db.scalars(select(models.User.email).where(models.User.email.in_(emails))))
+
+
+def insert_users(db: Session, group_id: int, users: List[dict]) -> Dict[str, int]:
+    """
+    Insert `users` (column dicts) into the group with one executemany. An
+    email registered meanwhile is skipped by ON CONFLICT instead of failing
+    the batch. Returns the id of each inserted email.
+    """
+    stmt = (
+        dialect_insert(db, models.User)
+        .on_conflict_do_nothing(index_elements=[models.User.email])
+        .returning(models.User.id, models.User.email)
+    )
+    rows = db.execute(stmt, [{**user, "group_id": group_id} for user in users]).all()
+    after_commit(db, _invalidate_members, group_id)
+    return {email: user_id for user_id, email in rows}
 
 
 def save_user(db: Session, user: models.User):
+    # Se o usuário trocou de grupo, os dois grupos mudam.
+    previous = inspect(user).attrs.group_id.history.deleted
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()
+    after_commit(db, _invalidate_members, user.group_id, *previous)
     return user
@@ -1,18 +1,100 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
+from app.core.pool_metrics import PoolMetrics, instrumented_pool_class
+from app.core.query_metrics import instrument_engine
+
 # Carrega o .env da raiz
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# DATABASE_ASYNC=1 liga o modo assíncrono (AsyncEngine + rotas async de /sync)
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "").lower() in ("1", "true", "yes")
+
+# Driver assíncrono usado para cada banco quando DATABASE_ASYNC está ligado
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+# Pool de conexões (valores padrão do SQLAlchemy, exceto recycle)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+# Recicla conexões antigas; com pre-ping desligado é o que evita conexões mortas
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+# Pre-ping custa um round trip por checkout; pode ser desligado em favor do recycle
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+def _engine_options(url: str, base_pool: type, metrics: PoolMetrics) -> dict:
+    options = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # SQLite em memória usa um pool próprio, sem dimensionamento
+        return options
+    options.update(
+        poolclass=instrumented_pool_class(base_pool, metrics),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
+
+def _is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def use_sqlite_wal(engine) -> None:
+    """
+    WAL for file SQLite (desenvolvimento/benchmarks). A transação agora dura
+    a requisição inteira; no journal padrão um leitor que tenta escrever
+    enquanto outra transação faz commit recebe "database is locked" na hora.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+
 # Cria o engine
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
+    **_engine_options(DATABASE_URL, QueuePool, pool_metrics),
 )
+pool_metrics.bind(engine.pool)
+instrument_engine(engine)
+if _is_sqlite_file(DATABASE_URL):
+    use_sqlite_wal(engine)
 
 # Sessão do banco
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -20,11 +102,79 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base para os modelos
 Base = declarative_base()
 
+# Unidade de trabalho por requisição: os CRUDs só fazem flush; get_db faz
+# o único commit quando a rota retorna (a resposta já foi serializada) e
+# descarta tudo se ela levantar. O que depende do commit (broadcast, cache)
+# é registrado com after_commit.
+def after_commit(db, callback, *args) -> None:
+    """Run `callback(*args)` once the session's current transaction commits."""
+    db.info.setdefault("after_commit", []).append((callback, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    for callback, args in session.info.pop("after_commit", ()):
+        callback(*args)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_after_commit(session, transaction):
+    # Rollback (ou close sem commit) da transação raiz: nada foi gravado.
+    if transaction.parent is None:
+        session.info.pop("after_commit", None)
+
+
+def dialect_insert(db, model):
+    """INSERT with the dialect's ON CONFLICT support (Postgres or SQLite)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
 # Dependency para usar nas rotas
 def get_db():
     db = SessionLocal()
     try:
         yield db
+        db.commit()
     finally:
         db.close()
 
+
+def async_database_url(url: str) -> str:
+    """Same database as `url`, addressed through its async driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise RuntimeError(f"No async driver configured for '{backend}'")
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    async_engine = create_async_engine(
+        async_database_url(DATABASE_URL),
+        **_engine_options(DATABASE_URL, AsyncAdaptedQueuePool, async_pool_metrics),
+    )
+    async_pool_metrics.bind(async_engine.sync_engine.pool)
+    instrument_engine(async_engine.sync_engine)
+    if _is_sqlite_file(DATABASE_URL):
+        use_sqlite_wal(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+# Dependency para as rotas async
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+        await db.commit()
@@ -0,0 +1,217 @@
+"""
+Server-side alarm scheduler. The next fire time of each note (snooze_until,
+else alarm_at) is indexed by ix_notes_alarm_fire_at; only the alarms due
+within ALARM_HORIZON are kept in memory, in a heap that the scheduler tops
+up a page at a time as the horizon moves forward. Writes reschedule their
+note after commit in O(log n): the new entry is pushed and the old one is
+skipped when it reaches the top. At fire time an "alarm_due" sync event
+goes to the note's group; notes.alarm_fired_at makes sure only one worker
+(and only once across restarts) emits it.
+"""
+import heapq
+import itertools
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.broadcaster import broadcaster
+from app.core.pagination import key_tuple
+from app.crud.sync import ALARM_EVENT, ALARM_FIRE_AT
+from app.database import SessionLocal, after_commit
+from app.jobs.scheduler import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre verificações (precisão do disparo); 0 desliga o agendador.
+ALARM_TICK = float(os.getenv("ALARM_TICK", "1"))
+# Alarmes carregados em memória: os que disparam nos próximos N segundos.
+ALARM_HORIZON = int(os.getenv("ALARM_HORIZON", "3600"))
+# Linhas por consulta ao carregar o horizonte.
+ALARM_LOAD_CHUNK = int(os.getenv("ALARM_LOAD_CHUNK", "1000"))
+# Na partida, alarmes vencidos há mais que isso (s) não disparam mais.
+ALARM_GRACE = int(os.getenv("ALARM_GRACE", "3600"))
+
+# Ordem de carga: a mesma do índice ix_notes_alarm_fire_at.
+ALARM_KEY = (ALARM_FIRE_AT, models.Note.id)
+
+
+def _pending(*criteria):
+    """Notes with an alarm that was not emitted yet."""
+    return (
+        ALARM_FIRE_AT.is_not(None),
+        models.Note.deleted.is_not(True),
+        or_(models.Note.alarm_fired_at.is_(None), models.Note.alarm_fired_at < ALARM_FIRE_AT),
+        *criteria,
+    )
+
+
+def pending_alarms_query(after: Tuple[datetime, int], until: datetime, limit: int):
+    """Next `limit` pending alarms after the (fire_at, id) key `after`, up to `until`."""
+    return (
+        select(models.Note.id, ALARM_FIRE_AT.label("fire_at"))
+        .where(*_pending(tuple_(*ALARM_KEY) > key_tuple(ALARM_KEY, after), ALARM_FIRE_AT <= until))
+        .order_by(*ALARM_KEY)
+        .limit(limit)
+    )
+
+
+def fire_alarms_stmt(note_ids: List[int], now: datetime):
+    # Confere de novo no banco: a nota pode ter sido adiada, apagada ou
+    # disparada por outro worker. updated_at é repetido para não acionar o
+    # onupdate: disparar não é uma edição da nota.
+    return (
+        update(models.Note)
+        .where(models.Note.id.in_(note_ids), *_pending(ALARM_FIRE_AT <= now))
+        .values(alarm_fired_at=ALARM_FIRE_AT, updated_at=models.Note.updated_at)
+        .returning(models.Note.id, models.Note.group_id, models.Note.revision)
+        .execution_options(synchronize_session=False)
+    )
+
+
+class AlarmScheduler:
+    def __init__(
+        self,
+        horizon: int = ALARM_HORIZON,
+        chunk: int = ALARM_LOAD_CHUNK,
+        grace: int = ALARM_GRACE,
+    ) -> None:
+        self.horizon = timedelta(seconds=horizon)
+        self.chunk = chunk
+        self.grace = timedelta(seconds=grace)
+        self.fired = 0
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[datetime, int, int]] = []  # (fire_at, seq, note_id)
+        self._entries: Dict[int, Tuple[datetime, int]] = {}  # note_id -> entrada válida
+        self._seq = itertools.count()
+        self._loaded_until: Optional[datetime] = None
+        self._cursor: Optional[Tuple[datetime, int]] = None
+
+    def _push(self, note_id: int, fire_at: datetime) -> None:
+        seq = next(self._seq)
+        self._entries[note_id] = (fire_at, seq)
+        heapq.heappush(self._heap, (fire_at, seq, note_id))
+
+    def reschedule(self, note_id: int, fire_at: Optional[datetime]) -> None:
+        """
+        Track the note's new fire time (None = no alarm). Times past the
+        loaded horizon are left to the loader.
+        """
+        if fire_at is not None:
+            fire_at = fire_at.replace(tzinfo=None)
+        with self._lock:
+            if fire_at is None or self._loaded_until is None or fire_at > self._loaded_until:
+                self._entries.pop(note_id, None)
+                return
+            current = self._entries.get(note_id)
+            if current is None or current[0] != fire_at:
+                self._push(note_id, fire_at)
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, seq, note_id = heapq.heappop(self._heap)
+                # Entrada substituída por um reagendamento: descartada aqui.
+                if self._entries.get(note_id) == (fire_at, seq):
+                    del self._entries[note_id]
+                    due.append(note_id)
+            # Muitas entradas mortas: reconstrói o heap só com as válidas.
+            if len(self._heap) > 2 * len(self._entries) + self.chunk:
+                self._heap = [(fire_at, seq, note_id) for note_id, (fire_at, seq) in self._entries.items()]
+                heapq.heapify(self._heap)
+        return due
+
+    def _load(self, db: Session, now: datetime) -> int:
+        """Page pending alarms into the heap until the horizon is covered."""
+        until = now + self.horizon
+        if self._loaded_until is not None and self._loaded_until - now > self.horizon / 2:
+            return 0
+        if self._cursor is None:
+            self._cursor = (now - self.grace, 0)
+        loaded = 0
+        while True:
+            rows = db.execute(pending_alarms_query(self._cursor, until, self.chunk)).all()
+            with self._lock:
+                for note_id, fire_at in rows:
+                    # Um reagendamento já registrado é mais recente que a leitura.
+                    if note_id not in self._entries:
+                        self._push(note_id, fire_at)
+            loaded += len(rows)
+            if rows:
+                self._cursor = tuple(rows[-1])
+            if len(rows) < self.chunk:
+                break
+        with self._lock:
+            self._loaded_until = until
+        return loaded
+
+    def _fire(self, db: Session, note_ids: List[int], now: datetime) -> int:
+        fired = db.execute(fire_alarms_stmt(note_ids, now)).all()
+        if fired:
+            db.execute(
+                insert(models.SyncEvent),
+                [
+                    {
+                        "note_id": note_id,
+                        "group_id": group_id,
+                        "event_type": ALARM_EVENT,
+                        "updated_at": now,
+                        "revision": revision,
+                    }
+                    for note_id, group_id, revision in fired
+                ],
+            )
+            for group_id in {group_id for _, group_id, _ in fired}:
+                after_commit(db, broadcaster.publish, group_id)
+        # Notas que não dispararam mudaram depois de entrar no heap; o
+        # horário atual delas volta para a fila.
+        skipped = set(note_ids) - {note_id for note_id, _, _ in fired}
+        if skipped:
+            rows = db.execute(
+                select(models.Note.id, ALARM_FIRE_AT).where(models.Note.id.in_(skipped), *_pending())
+            ).all()
+            for note_id, fire_at in rows:
+                self.reschedule(note_id, fire_at)
+        db.commit()
+        return len(fired)
+
+    def tick(self, now: Optional[datetime] = None) -> dict:
+        """Top up the horizon and emit the alarms that are due."""
+        now = now or datetime.utcnow()
+        with SessionLocal() as db:
+            loaded = self._load(db, now)
+            due = self._pop_due(now)
+            fired = self._fire(db, due, now) if due else 0
+        if fired:
+            self.fired += fired
+            logger.info("alarm scheduler: %d alarms fired", fired)
+        return {"loaded": loaded, "due": len(due), "fired": fired}
+
+    def reset(self) -> None:
+        """Forget everything; the next tick reloads from the database."""
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
+            self._loaded_until = None
+            self._cursor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            next_entry = min(self._entries.values(), default=None)
+            return {
+                "tracked": len(self._entries),
+                "heap": len(self._heap),
+                "next_fire_at": next_entry[0] if next_entry else None,
+                "loaded_until": self._loaded_until,
+                "fired": self.fired,
+            }
+
+
+alarm_scheduler = AlarmScheduler()
+alarm_job = PeriodicJob("alarms", ALARM_TICK, alarm_scheduler.tick)
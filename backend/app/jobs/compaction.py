@@ -0,0 +1,125 @@
+"""
+Background compaction of sync_events. Superseded events are reclaimed once
+every active client of the group acknowledged past them, or once they were
+recorded longer ago than the retention window. The latest event of each
+note, tombstones included, is always kept: it is how devices that never
+acked (or ack anonymously) learn about the note. An alarm_due event never
+supersedes the note's own event, which the `since` feed still needs.
+"""
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, exists, func, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from app import models
+from app.crud.sync import ALARM_EVENT
+from app.database import SessionLocal
+from app.jobs.scheduler import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+# Clientes offline por mais que isso fazem sync completo ao voltar.
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", "30"))
+# Linhas por DELETE; cada lote é commitado para não segurar locks longos.
+SYNC_COMPACTION_CHUNK = int(os.getenv("SYNC_COMPACTION_CHUNK", "5000"))
+# Segundos entre execuções; 0 desliga o agendamento (o gatilho em /admin continua).
+SYNC_COMPACTION_INTERVAL = int(os.getenv("SYNC_COMPACTION_INTERVAL", "3600"))
+
+
+@dataclass
+class CompactionReport:
+    superseded: int = 0
+    seconds: float = 0.0
+    finished_at: Optional[datetime] = field(default=None)
+
+    @property
+    def reclaimed(self) -> int:
+        return self.superseded
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["reclaimed"] = self.reclaimed
+        return data
+
+
+def _purgeable(cutoff: datetime):
+    # Menor watermark entre os clientes ativos do grupo; grupo sem clientes
+    # ativos dá NULL e só a retenção vale. A retenção conta pelo relógio do
+    # servidor (created_at): updated_at vem do cliente e pode ser antigo.
+    watermark = (
+        select(func.min(models.SyncClient.acked_event_id))
+        .where(
+            models.SyncClient.group_id == models.SyncEvent.group_id,
+            models.SyncClient.last_seen_at >= cutoff,
+        )
+        .scalar_subquery()
+    )
+    return or_(models.SyncEvent.id <= watermark, models.SyncEvent.created_at < cutoff)
+
+
+def superseded_query(cutoff: datetime, limit: int):
+    """Events with a later event for the same note, already safe to drop."""
+    later = aliased(models.SyncEvent)
+    # alarm_due fica fora do feed por `since`: não substitui o evento da nota.
+    newer = exists().where(
+        later.note_id == models.SyncEvent.note_id,
+        later.id > models.SyncEvent.id,
+        or_(later.event_type.is_distinct_from(ALARM_EVENT), models.SyncEvent.event_type == ALARM_EVENT),
+    )
+    return select(models.SyncEvent.id).where(newer, _purgeable(cutoff)).limit(limit)
+
+
+def _delete_chunked(db: Session, query_for_chunk) -> int:
+    total = 0
+    while True:
+        ids = db.scalars(query_for_chunk()).all()
+        if not ids:
+            return total
+        total += db.execute(
+            delete(models.SyncEvent)
+            .where(models.SyncEvent.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+
+
+def compact_sync_events(
+    db: Session,
+    retention_days: int = SYNC_RETENTION_DAYS,
+    chunk: int = SYNC_COMPACTION_CHUNK,
+) -> CompactionReport:
+    """
+    Drop superseded events below the group's delivery watermark or past the
+    retention window. The latest event of every note, deleted or not, is
+    its entry in the change feed and is never removed.
+    """
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+    report = CompactionReport()
+    report.superseded = _delete_chunked(db, lambda: superseded_query(cutoff, chunk))
+    report.seconds = round(time.perf_counter() - started, 3)
+    report.finished_at = datetime.utcnow()
+
+    logger.info(
+        "sync_events compaction: %d superseded rows reclaimed in %.3fs",
+        report.superseded,
+        report.seconds,
+    )
+    return report
+
+
+def run_compaction() -> CompactionReport:
+    db = SessionLocal()
+    try:
+        return compact_sync_events(db)
+    finally:
+        db.close()
+
+
+compaction_job = PeriodicJob("sync_compaction", SYNC_COMPACTION_INTERVAL, run_compaction)
@@ -0,0 +1,143 @@
+"""
+Background expiry and archiving of group invitations. Pending invitations
+past expires_at are marked "expired" in bulk; invitations that stopped
+being pending more than INVITE_ARCHIVE_DAYS ago move to
+group_invitations_archive, so the unique token index only holds live rows.
+Preview and accept still find archived tokens through the archive table.
+"""
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import DateTime, delete, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.cache import cache, group_invitations_key
+from app.database import SessionLocal
+from app.jobs.scheduler import PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+# Dias que um convite aceito, revogado ou expirado continua na listagem do grupo.
+INVITE_ARCHIVE_DAYS = int(os.getenv("INVITE_ARCHIVE_DAYS", "7"))
+# Linhas por lote; cada lote é commitado para não segurar locks longos.
+INVITE_ARCHIVE_CHUNK = int(os.getenv("INVITE_ARCHIVE_CHUNK", "1000"))
+# Segundos entre execuções; 0 desliga o agendamento (o gatilho em /admin continua).
+INVITE_ARCHIVE_INTERVAL = int(os.getenv("INVITE_ARCHIVE_INTERVAL", "3600"))
+
+# Colunas copiadas para o arquivo com o mesmo nome; o id do convite vai para
+# invitation_id e o arquivo tem a própria chave.
+ARCHIVE_COLUMNS = (
+    "group_id",
+    "email",
+    "token",
+    "status",
+    "expires_at",
+    "created_by_user_id",
+    "created_at",
+    "updated_at",
+)
+
+
+@dataclass
+class InvitationArchiveReport:
+    expired: int = 0
+    archived: int = 0
+    seconds: float = 0.0
+    finished_at: Optional[datetime] = field(default=None)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def expire_chunk(db: Session, now: datetime, chunk: int) -> List[int]:
+    """Mark up to `chunk` overdue pending invitations as expired; one group id per row."""
+    invitation = models.GroupInvitation
+    ids = (
+        select(invitation.id)
+        .where(invitation.status == "pending", invitation.expires_at < now)
+        .limit(chunk)
+    )
+    stmt = (
+        update(invitation)
+        .where(invitation.id.in_(ids))
+        .values(status="expired", updated_at=now)
+        .returning(invitation.group_id)
+        .execution_options(synchronize_session=False)
+    )
+    return db.scalars(stmt).all()
+
+
+def archive_chunk(db: Session, cutoff: datetime, now: datetime, chunk: int) -> List[int]:
+    """Move up to `chunk` settled invitations last touched before `cutoff`; one group id per row."""
+    invitation = models.GroupInvitation
+    archive = models.GroupInvitationArchive
+    ids = db.scalars(
+        select(invitation.id)
+        .where(invitation.status != "pending", invitation.updated_at < cutoff)
+        .order_by(invitation.id)
+        .limit(chunk)
+    ).all()
+    if not ids:
+        return []
+    source = select(
+        invitation.id, *(getattr(invitation, name) for name in ARCHIVE_COLUMNS), literal(now, DateTime)
+    ).where(invitation.id.in_(ids))
+    db.execute(insert(archive).from_select(["invitation_id", *ARCHIVE_COLUMNS, "archived_at"], source))
+    stmt = (
+        delete(invitation)
+        .where(invitation.id.in_(ids))
+        .returning(invitation.group_id)
+        .execution_options(synchronize_session=False)
+    )
+    return db.scalars(stmt).all()
+
+
+def _run_chunked(db: Session, step, chunk: int) -> int:
+    total = 0
+    while True:
+        groups = step()
+        db.commit()
+        for group_id in set(groups):
+            cache.invalidate_prefix(group_invitations_key(group_id))
+        total += len(groups)
+        if len(groups) < chunk:
+            return total
+
+
+def archive_invitations(
+    db: Session,
+    archive_days: int = INVITE_ARCHIVE_DAYS,
+    chunk: int = INVITE_ARCHIVE_CHUNK,
+) -> InvitationArchiveReport:
+    """Expire overdue invitations, then archive the settled ones past the retention."""
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=archive_days)
+    report = InvitationArchiveReport()
+    report.expired = _run_chunked(db, lambda: expire_chunk(db, now, chunk), chunk)
+    report.archived = _run_chunked(db, lambda: archive_chunk(db, cutoff, now, chunk), chunk)
+    report.seconds = round(time.perf_counter() - started, 3)
+    report.finished_at = datetime.utcnow()
+    logger.info(
+        "invitations: %d expired, %d archived in %.3fs",
+        report.expired,
+        report.archived,
+        report.seconds,
+    )
+    return report
+
+
+def run_invitation_archive() -> InvitationArchiveReport:
+    db = SessionLocal()
+    try:
+        return archive_invitations(db)
+    finally:
+        db.close()
+
+
+invitation_archive_job = PeriodicJob("invitation_archive", INVITE_ARCHIVE_INTERVAL, run_invitation_archive)
@@ -0,0 +1,156 @@
+"""
+Admin reset and group purge, run as a background job. On Postgres the reset
+is a single TRUNCATE ... CASCADE; the group purge, and the reset on SQLite
+or when TRUNCATE can't get its locks in time, deletes PURGE_CHUNK rows at a
+time with one commit each, so live sync traffic waits at most for a chunk.
+Progress is readable from GET /admin/purge while the job runs.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.core.auth import token_cache
+from app.core.cache import cache
+from app.crud import admin as admin_crud
+from app.database import SessionLocal
+from app.jobs.alarms import alarm_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Linhas por DELETE; cada lote é commitado.
+PURGE_CHUNK = int(os.getenv("PURGE_CHUNK", "5000"))
+# Espera máxima pelos locks do TRUNCATE antes de cair para DELETE em lotes.
+PURGE_LOCK_TIMEOUT_MS = int(os.getenv("PURGE_LOCK_TIMEOUT_MS", "5000"))
+
+
+class PurgeBusy(Exception):
+    pass
+
+
+@dataclass
+class PurgeReport:
+    scope: str  # reset | group
+    group_id: Optional[int] = None
+    state: str = "running"  # running | done | failed
+    method: str = "delete"  # truncate | delete
+    table: Optional[str] = None  # tabela em andamento
+    deleted: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _delete_scopes(
+    db: Session,
+    scopes: List[Tuple[type, object]],
+    report: PurgeReport,
+    chunk: int,
+    marks: Optional[Dict[str, Optional[int]]] = None,
+) -> None:
+    for model, criteria in scopes:
+        name = model.__tablename__
+        report.table = name
+        report.deleted[name] = 0
+        upto = marks[name] if marks is not None else None
+        if marks is not None and upto is None:
+            continue  # tabela vazia no início
+        while True:
+            removed = admin_crud.delete_chunk(db, model, criteria, chunk, upto)
+            db.commit()
+            report.deleted[name] += removed
+            if removed < chunk:
+                break
+    report.table = None
+
+
+def reset_database(db: Session, report: PurgeReport, chunk: int = PURGE_CHUNK) -> None:
+    """
+    Remove every group, user, note and sync row. Rows created after the
+    reset started (the client sets itself up again right away) are kept.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        try:
+            admin_crud.truncate_all(db, PURGE_LOCK_TIMEOUT_MS)
+            db.commit()
+            report.method = "truncate"
+            return
+        except DBAPIError:
+            db.rollback()
+            logger.warning("reset: TRUNCATE did not get its locks, deleting in chunks")
+    scopes = admin_crud.reset_scopes()
+    _delete_scopes(db, scopes, report, chunk, admin_crud.high_water_marks(db, scopes))
+
+
+def purge_group(db: Session, group_id: int, report: PurgeReport, chunk: int = PURGE_CHUNK) -> None:
+    """Remove the group with its users, notes, events, clients and invitations."""
+    _delete_scopes(db, admin_crud.group_scopes(group_id), report, chunk)
+
+
+def _forget_cached_state() -> None:
+    # Também após falha: os lotes já commitados saíram do banco.
+    token_cache.clear()
+    cache.clear()
+    alarm_scheduler.reset()
+
+
+class PurgeJob:
+    """One purge at a time, on its own thread; `report` is the current or last run."""
+
+    def __init__(self) -> None:
+        self.report: Optional[PurgeReport] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.report is not None and self.report.state == "running"
+
+    def start(self, scope: str, group_id: Optional[int] = None, wait: bool = False) -> PurgeReport:
+        """Start a purge; with `wait` it runs on the calling thread. Raises PurgeBusy."""
+        with self._lock:
+            if self.running:
+                raise PurgeBusy()
+            report = self.report = PurgeReport(scope, group_id)
+        if wait:
+            self._run(report)
+        else:
+            threading.Thread(target=self._run, args=(report,), name=f"purge-{scope}", daemon=True).start()
+        return report
+
+    def _run(self, report: PurgeReport) -> None:
+        started = time.perf_counter()
+        try:
+            with SessionLocal() as db:
+                if report.scope == "reset":
+                    reset_database(db, report)
+                else:
+                    purge_group(db, report.group_id, report)
+        except Exception as exc:
+            report.error = repr(exc)
+            logger.exception("purge %s failed", report.scope)
+        finally:
+            _forget_cached_state()
+            report.seconds = round(time.perf_counter() - started, 3)
+            report.finished_at = datetime.utcnow()
+            report.state = "failed" if report.error else "done"
+        logger.info(
+            "purge %s%s: %s in %.3fs (%s)",
+            report.scope,
+            f" group {report.group_id}" if report.group_id is not None else "",
+            report.state,
+            report.seconds,
+            report.method,
+        )
+
+
+purge_job = PurgeJob()
@@ -0,0 +1,61 @@
+"""
+Minimal in-process scheduler for maintenance jobs. Each job runs on a
+worker thread at a fixed interval; a lock keeps a manual trigger from
+overlapping a scheduled run.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    def __init__(self, name: str, interval: float, func: Callable[[], Any]) -> None:
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run_once(self) -> Any:
+        """Run the job now on the calling thread, waiting for a run in progress."""
+        with self._lock:
+            try:
+                self.last_result = self.func()
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = repr(exc)
+                logger.exception("job %s failed", self.name)
+                raise
+            return self.last_result
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                # Já registrado em run_once; a próxima execução tenta de novo.
+                pass
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -1,15 +1,66 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
 
-from app.routes import auth, groups, users, admin, sync, invitations
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+
+from app.core.encoding import SyncEncodingMiddleware
+from app.core.pagination import InvalidCursor
+from app.core.query_metrics import QueryMetricsMiddleware
+from app.core.ratelimit import RateLimitMiddleware
+from app.core.security import PasswordHashingBusy
+from app.database import DATABASE_ASYNC
+from app.jobs.alarms import alarm_job
+from app.jobs.compaction import compaction_job
+from app.jobs.invitations import invitation_archive_job
+from app.routes import auth, groups, users, admin, metrics, notes, sync, sync_stream, invitations
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    compaction_job.start()
+    alarm_job.start()
+    invitation_archive_job.start()
+    yield
+    await invitation_archive_job.stop()
+    await alarm_job.stop()
+    await compaction_job.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(SyncEncodingMiddleware, prefix="/sync")
+# Recusa antes de descompactar o corpo ou ocupar uma thread
+app.add_middleware(RateLimitMiddleware)
+# Por último = mais externo: mede também a compressão
+app.add_middleware(QueryMetricsMiddleware)
+
+
+@app.exception_handler(PasswordHashingBusy)
+def password_hashing_busy(request: Request, exc: PasswordHashingBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(InvalidCursor)
+def invalid_cursor(request: Request, exc: InvalidCursor):
+    return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(exc)})
 
-app = FastAPI()
 
 app.include_router(auth.router, prefix="/auth")
 app.include_router(groups.router)
 app.include_router(users.router)
 app.include_router(admin.router)
-app.include_router(sync.router)
+if DATABASE_ASYNC:
+    from app.routes import sync_async
+
+    app.include_router(sync_async.router)
+else:
+    app.include_router(sync.router)
+app.include_router(sync_stream.router)
 app.include_router(invitations.router)
+app.include_router(notes.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index, func, literal_column
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
+from .core import search
 from .database import Base
 
 
@@ -43,6 +44,7 @@ class Note(Base):
     __tablename__ = "notes"
 
     id = Column(Integer, primary_key=True, index=True)
+    client_note_id = Column(String(64), nullable=False)  # id gerado pelo cliente
 
     group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"))
     created_by_user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
@@ -50,13 +52,42 @@ class Note(Base):
 
     title = Column(String(255))
     content = Column(Text)     # FlowDocument em XAML
+    # Texto puro do content, indexado pela busca; não é carregado com a nota
+    search_text = deferred(Column(Text))
+    content_hash = Column(String(64))  # sha256 do content
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
     geometry = Column(String)  # posição/tamanho JSON stringificado
     alarm_at = Column(DateTime, nullable=True)
     snooze_until = Column(DateTime, nullable=True)
+    # Horário do último alarme emitido pelo agendador (evita disparo duplicado)
+    alarm_fired_at = Column(DateTime, nullable=True)
     deleted = Column(Boolean, default=False)
 
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Identidade da nota no upsert; notas sem grupo compartilham o escopo 0.
+        Index(
+            "uq_notes_group_client_note_id",
+            func.coalesce(group_id, literal_column("0")),
+            client_note_id,
+            unique=True,
+        ),
+        # Próximo disparo (adiamento, senão alarme), só das notas com alarme;
+        # o agendador percorre este índice em ordem.
+        Index(
+            "ix_notes_alarm_fire_at",
+            func.coalesce(snooze_until, alarm_at),
+            id,
+            postgresql_where=func.coalesce(snooze_until, alarm_at).is_not(None),
+            sqlite_where=func.coalesce(snooze_until, alarm_at).is_not(None),
+        ),
+    )
+
+
+# Índice de texto (tsvector/GIN no Postgres, FTS5 no SQLite) fora do ORM.
+search.install(Note.__table__)
+
 
 class SyncEvent(Base):
     __tablename__ = "sync_events"
@@ -64,8 +95,37 @@ class SyncEvent(Base):
     id = Column(Integer, primary_key=True)
     note_id = Column(Integer, ForeignKey("notes.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"))  # cópia de notes.group_id
     event_type = Column(String(50))   # created, updated, deleted
-    updated_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # horário do cliente
+    created_at = Column(DateTime, default=datetime.utcnow)  # gravação no servidor (retenção)
+    revision = Column(Integer)         # revisão da nota gerada pelo evento
+    base_revision = Column(Integer)    # revisão sobre a qual o patch se aplica
+    patch = Column(Text)               # operações JSON; nulo = só conteúdo completo
+
+    __table_args__ = (
+        # Feed por grupo: WHERE group_id = ? AND id > cursor
+        Index("ix_sync_events_group_id_id", "group_id", "id"),
+        Index("ix_sync_events_group_id_updated_at", "group_id", "updated_at"),
+        Index("ix_sync_events_updated_at", "updated_at"),
+        # Compactação: eventos anteriores ao último de cada nota
+        Index("ix_sync_events_note_id_id", "note_id", "id"),
+    )
+
+
+class SyncClient(Base):
+    __tablename__ = "sync_clients"
+
+    id = Column(Integer, primary_key=True)
+    client_id = Column(String(64), unique=True, nullable=False)  # id do dispositivo
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"))
+    acked_event_id = Column(Integer, nullable=False, default=0, server_default="0")  # watermark
+    last_seen_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_sync_clients_group_id_acked_event_id", "group_id", "acked_event_id"),
+    )
 
 
 class GroupInvitation(Base):
@@ -80,3 +140,28 @@ class GroupInvitation(Base):
     created_by_user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Varredura de convites vencidos do job de arquivamento
+        Index("ix_group_invitations_status_expires_at", status, expires_at),
+    )
+
+
+class GroupInvitationArchive(Base):
+    """Expired, accepted and revoked invitations moved out of group_invitations."""
+
+    __tablename__ = "group_invitations_archive"
+
+    # Chave própria: o SQLite reutiliza o maior id de group_invitations depois
+    # que esse convite é arquivado, então o id original pode se repetir aqui.
+    id = Column(Integer, primary_key=True)
+    invitation_id = Column(Integer)  # id do convite em group_invitations
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), index=True)
+    email = Column(String(200))
+    token = Column(String(64), index=True, nullable=False)
+    status = Column(String(20))
+    expires_at = Column(DateTime)
+    created_by_user_id = Column(Integer)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
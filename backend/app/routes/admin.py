@@ -1,14 +1,119 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from app.database import get_db
-from app.crud import admin as admin_crud
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.auth import token_cache
+from app.core.cache import cache
+from app.core.ratelimit import limiter
+from app.database import DATABASE_ASYNC, SessionLocal, async_pool_metrics, pool_metrics
+from app.jobs.alarms import alarm_job, alarm_scheduler
+from app.jobs.compaction import compaction_job
+from app.jobs.invitations import invitation_archive_job
+from app.jobs.purge import PurgeBusy, purge_job
+from app import models
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 
-@router.post("/reset")
-def reset_system(db: Session = Depends(get_db)):
-    admin_crud.reset_all(db)
-    return {"status": "reset_complete"}
+def _start_purge(scope: str, group_id: Optional[int], wait: bool) -> JSONResponse:
+    try:
+        report = purge_job.start(scope, group_id, wait=wait)
+    except PurgeBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A purge is already running")
+    if not wait:
+        code = status.HTTP_202_ACCEPTED
+    elif report.state == "failed":
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    else:
+        code = status.HTTP_200_OK
+    return JSONResponse(jsonable_encoder(report.as_dict()), status_code=code)
+
+
+@router.post("/reset", status_code=status.HTTP_202_ACCEPTED)
+def reset_system(wait: bool = Query(False, description="Espera o fim e devolve o relatório")):
+    """Remove all data in the background; progress at GET /admin/purge."""
+    return _start_purge("reset", None, wait)
+
+
+@router.post("/groups/{group_id}/purge", status_code=status.HTTP_202_ACCEPTED)
+def purge_group(group_id: int, wait: bool = Query(False, description="Espera o fim e devolve o relatório")):
+    """Remove one group and everything in it, in the background."""
+    # Sessão curta: nada pode ficar aberto segurando locks durante a purga.
+    with SessionLocal() as db:
+        if db.get(models.Group, group_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+    return _start_purge("group", group_id, wait)
+
+
+@router.get("/purge")
+def purge_status():
+    report = purge_job.report
+    return {"running": purge_job.running, "report": report.as_dict() if report else None}
+
+
+@router.get("/pool")
+def pool_stats():
+    stats = {"sync": pool_metrics.snapshot()}
+    if DATABASE_ASYNC:
+        stats["async"] = async_pool_metrics.snapshot()
+    return stats
+
+
+@router.get("/cache")
+def cache_stats():
+    return {
+        "snapshots": cache.stats(),
+        "tokens": {"hits": token_cache.hits, "misses": token_cache.misses},
+    }
+
+
+@router.get("/ratelimit")
+def ratelimit_stats():
+    return limiter.stats()
+
+
+@router.get("/compaction")
+def compaction_status():
+    report = compaction_job.last_result
+    return {
+        "running": compaction_job.running,
+        "interval": compaction_job.interval,
+        "last_report": report.as_dict() if report else None,
+        "last_error": compaction_job.last_error,
+    }
+
+
+@router.get("/alarms")
+def alarm_status():
+    return {
+        **alarm_scheduler.stats(),
+        "interval": alarm_job.interval,
+        "last_error": alarm_job.last_error,
+    }
+
+
+@router.post("/compaction")
+async def run_compaction():
+    report = await run_in_threadpool(compaction_job.run_once)
+    return report.as_dict()
+
+
+@router.get("/invitations/archive")
+def invitation_archive_status():
+    report = invitation_archive_job.last_result
+    return {
+        "running": invitation_archive_job.running,
+        "interval": invitation_archive_job.interval,
+        "last_report": report.as_dict() if report else None,
+        "last_error": invitation_archive_job.last_error,
+    }
+
+
+@router.post("/invitations/archive")
+async def run_invitation_archive():
+    report = await run_in_threadpool(invitation_archive_job.run_once)
+    return report.as_dict()
@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 
-from app.database import get_db
+from app import models
+from app.database import SessionLocal
 from app.schemas.auth import LoginRequest, LoginResponse, UserInfo
-from app.core.security import verify_password, create_access_token
+from app.core.security import verify_password_async, create_access_token
 from app.crud import auth as auth_crud
 
 router = APIRouter(tags=["auth"])
 
 
+def _load_user(email: str) -> models.User | None:
+    # Sessão própria, fechada antes do hash: o bcrypt não segura conexão
+    with SessionLocal() as db:
+        return auth_crud.get_user_by_email(db, email)
+
+
 @router.post("/login", response_model=LoginResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = auth_crud.get_user_by_email(db, payload.email.lower())
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginRequest):
+    user = await run_in_threadpool(_load_user, payload.email.lower())
+    if not user or not await verify_password_async(payload.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 
+from app.core.conditional import apply_validators, make_etag, not_modified
+from app.core.pagination import MAX_PAGE_SIZE, page_size, set_next_page
 from app.database import get_db
 from app.schemas.groups import GroupCreate, GroupResponse
 from app.crud import groups as groups_crud
@@ -15,5 +17,20 @@ def create_group(payload: GroupCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/list", response_model=list[GroupResponse])
-def list_groups(db: Session = Depends(get_db)):
-    return groups_crud.list_groups(db)
+def list_groups(
+    request: Request,
+    response: Response,
+    cursor: str | None = Query(None, description="X-Next-Cursor da página anterior"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Sem cursor nem limit: lista inteira"),
+    db: Session = Depends(get_db),
+):
+    limit = page_size(cursor, limit)
+    count, max_updated_at, max_id = groups_crud.list_version(db)
+    etag = make_etag("groups", cursor, limit, count, max_updated_at, max_id)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    groups, next_cursor = groups_crud.list_groups(db, cursor, limit)
+    apply_validators(response, etag)
+    set_next_page(request, response, next_cursor)
+    return groups
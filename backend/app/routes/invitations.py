@@ -1,13 +1,18 @@
-import secrets
 from datetime import datetime
+from typing import Iterator, List
 
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app import models
-from app.core.security import create_access_token, hash_password
-from app.crud import invitations as invitations_crud
-from app.database import get_db
+from app.core.bulk import NDJSON, ParsedRow, chunks, ndjson_lines, outcome, parse_rows
+from app.core.conditional import apply_validators, make_etag, not_modified
+from app.core.pagination import MAX_PAGE_SIZE, page_size, set_next_page
+from app.core.security import create_access_token, make_unusable_password
+from app.crud import groups as groups_crud, invitations as invitations_crud, users as users_crud
+from app.database import SessionLocal, get_db
 from app.schemas.groups import GroupResponse
 from app.schemas.invitations import (
     GroupInviteResponse,
@@ -22,8 +27,8 @@ from app.schemas.users import UserResponse
 router = APIRouter(prefix="/groups", tags=["invitations"])
 
 
-def _ensure_group(db: Session, group_id: int) -> models.Group:
-    group = db.query(models.Group).filter(models.Group.id == group_id).first()
+def _ensure_group(db: Session, group_id: int) -> GroupResponse:
+    group = groups_crud.get_group(db, group_id)
     if not group:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
     return group
@@ -53,21 +58,80 @@ def create_invite(
     )
 
 
+def _check_group(group_id: int) -> None:
+    with SessionLocal() as db:
+        _ensure_group(db, group_id)
+
+
+def _create_invites(group_id: int, rows: List[ParsedRow]) -> Iterator[dict]:
+    with SessionLocal() as db:
+        emails = {row.email.lower() for _, row in rows if not isinstance(row, str) and row.email}
+        registered = users_crud.existing_emails(db, emails)
+        seen, pending = set(), []
+        for number, row in rows:
+            if isinstance(row, str):
+                yield outcome(number, "invalid", detail=row)
+                continue
+            email = row.email.lower() if row.email else None
+            if email in registered:
+                yield outcome(number, "exists", email)
+            elif email is not None and email in seen:
+                yield outcome(number, "duplicate", email)
+            else:
+                seen.add(email)
+                pending.append((number, row))
+
+        for batch in chunks(pending):
+            created = invitations_crud.create_invitations(
+                db,
+                group_id,
+                [(row.email, row.created_by_user_id, row.expires_in_days) for _, row in batch],
+            )
+            db.commit()
+            for (number, _), invitation in zip(batch, created):
+                yield outcome(
+                    number,
+                    "created",
+                    invitation["email"],
+                    token=invitation["token"],
+                    expires_at=invitation["expires_at"],
+                )
+
+
+@router.post("/{group_id}/invite/bulk", response_class=StreamingResponse)
+async def create_invites_bulk(group_id: int, request: Request):
+    """
+    Create many invitations from a JSON list or a CSV (email,created_by_user_id,
+    expires_in_days; email may be empty). Streams one NDJSON line per row
+    (created | exists | duplicate | invalid) and a final summary.
+    """
+    rows = parse_rows(await request.body(), request.headers.get("content-type", ""), InviteCreateRequest)
+    await run_in_threadpool(_check_group, group_id)
+    return StreamingResponse(ndjson_lines(_create_invites(group_id, rows)), media_type=NDJSON)
+
+
 @router.get("/{group_id}/invitations", response_model=list[GroupInviteResponse])
-def list_invites(group_id: int, db: Session = Depends(get_db)):
-    _ensure_group(db, group_id)
-    invitations = invitations_crud.list_invitations(db, group_id)
-    return [
-        GroupInviteResponse(
-            token=inv.token,
-            email=inv.email,
-            status=inv.status,
-            expires_at=inv.expires_at,
-            created_by_user_id=inv.created_by_user_id,
-            group_id=inv.group_id,
-        )
-        for inv in invitations
-    ]
+def list_invites(
+    group_id: int,
+    request: Request,
+    response: Response,
+    cursor: str | None = Query(None, description="X-Next-Cursor da página anterior"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Sem cursor nem limit: lista inteira"),
+    db: Session = Depends(get_db),
+):
+    limit = page_size(cursor, limit)
+    group_updated_at, count, max_updated_at, max_id = invitations_crud.list_version(db, group_id)
+    etag = make_etag("invitations", group_id, cursor, limit, group_updated_at, count, max_updated_at, max_id)
+    # A existência do grupo vem da mesma consulta do ETag, não do cache.
+    if group_updated_at is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    invitations, next_cursor = invitations_crud.list_invitations(db, group_id, cursor, limit, etag)
+    apply_validators(response, etag)
+    set_next_page(request, response, next_cursor)
+    return invitations
 
 
 @router.delete("/invitations/{token}", status_code=status.HTTP_204_NO_CONTENT)
@@ -79,11 +143,17 @@ def revoke_invite(token: str = Path(..., description="Token do convite"), db: Se
     return {"status": "revoked"}
 
 
-@router.get("/invitations/{token}", response_model=InvitePreviewResponse)
-def preview_invite(token: str, db: Session = Depends(get_db)):
-    invitation = invitations_crud.get_by_token(db, token)
+def _find_invitation(db: Session, token: str):
+    """Live invitation, or its archived copy once the archive job moved it."""
+    invitation = invitations_crud.get_by_token(db, token) or invitations_crud.get_archived_by_token(db, token)
     if not invitation:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invitation not found")
+    return invitation
+
+
+@router.get("/invitations/{token}", response_model=InvitePreviewResponse)
+def preview_invite(token: str, db: Session = Depends(get_db)):
+    invitation = _find_invitation(db, token)
     group = _ensure_group(db, invitation.group_id)
     return InvitePreviewResponse(
         group_id=group.id,
@@ -95,20 +165,20 @@ def preview_invite(token: str, db: Session = Depends(get_db)):
 
 @router.post("/invitations/{token}/accept", response_model=InviteAcceptResponse)
 def accept_invite(token: str, payload: InviteAcceptRequest, db: Session = Depends(get_db)):
-    invitation = invitations_crud.get_by_token(db, token)
-    if not invitation:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invitation not found")
+    invitation = _find_invitation(db, token)
+    # Expirado pelo job ou ainda não varrido: mesma resposta para o cliente
+    expired = invitation.expires_at and invitation.expires_at < datetime.utcnow()
+    if invitation.status == "expired" or (invitation.status == "pending" and expired):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invitation expired")
     if invitation.status != "pending":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invitation is not pending")
-    if invitation.expires_at and invitation.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invitation expired")
 
     existing = db.query(models.User).filter(models.User.email == payload.email.lower()).first()
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
     group = _ensure_group(db, invitation.group_id)
-    password_hash = hash_password(secrets.token_hex(8))
+    password_hash = make_unusable_password()
     user = models.User(
         name=payload.name,
         email=payload.email.lower(),
@@ -117,15 +187,13 @@ def accept_invite(token: str, payload: InviteAcceptRequest, db: Session = Depend
         is_admin=False,
         group_id=group.id,
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    users_crud.save_user(db, user)
 
     invitations_crud.mark_accepted(db, invitation)
 
     access_token = create_access_token({"sub": str(user.id), "email": user.email})
     return InviteAcceptResponse(
-        group=GroupResponse.from_orm(group),
+        group=group,
         user=UserResponse.from_orm(user),
         access_token=access_token,
     )
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.cache import cache
+from app.core.query_metrics import registry
+from app.core.ratelimit import limiter
+from app.database import DATABASE_ASYNC, async_pool_metrics, pool_metrics
+
+
+router = APIRouter(tags=["metrics"])
+
+# Campos do snapshot do pool: valores instantâneos (gauge) e totais que só
+# crescem (counter, com sufixo _total para o rate() do Prometheus)
+POOL_GAUGES = ("checked_out", "overflow", "checkout_wait_p95_ms")
+POOL_COUNTERS = ("checkout_timeouts", "connections_opened")
+
+
+def _gauge(name: str, help_text: str, samples: dict, kind: str = "gauge") -> list:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{{{labels}}} {value}" for labels, value in samples.items()]
+    return lines
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format: per-route request/SQL totals, pool and cache."""
+    pools = {"sync": pool_metrics.snapshot()}
+    if DATABASE_ASYNC:
+        pools["async"] = async_pool_metrics.snapshot()
+    lines = []
+    for key in POOL_GAUGES:
+        samples = {f'pool="{name}"': stats[key] for name, stats in pools.items() if key in stats}
+        if samples:
+            lines += _gauge(f"db_pool_{key}", key.replace("_", " "), samples)
+    for key in POOL_COUNTERS:
+        samples = {f'pool="{name}"': stats[key] for name, stats in pools.items() if key in stats}
+        if samples:
+            lines += _gauge(f"db_pool_{key}_total", key.replace("_", " "), samples, kind="counter")
+    stats = cache.stats()
+    lookups = {'result="hit"': stats["hits"], 'result="miss"': stats["misses"]}
+    lines += _gauge("cache_lookups_total", "snapshot cache lookups", lookups, kind="counter")
+    ratelimit = limiter.stats()
+    lines += _gauge("ratelimit_active", "requests holding a concurrency slot", {f'rule="{name}"': n for name, n in ratelimit["active"].items()})
+    limited = {f'rule="{name}"': n for name, n in ratelimit["limited"].items()}
+    lines += _gauge("ratelimit_limited_total", "requests answered with 429", limited, kind="counter")
+    return registry.render() + "\n".join(lines) + "\n"
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.auth import caller_group, get_current_user
+from app.crud import notes as notes_crud
+from app.database import get_db
+from app.schemas.auth import CurrentUser
+from app.schemas.notes import NoteSearchResult
+
+router = APIRouter(prefix="/notes", tags=["notes"])
+
+
+@router.get("/search", response_model=list[NoteSearchResult])
+def search_notes(
+    q: str = Query(..., min_length=1, max_length=200, description="Palavras buscadas (a última vale como prefixo)"),
+    group_id: Optional[int] = Query(None, description="Grupo do cliente (padrão: o do usuário)"),
+    limit: int = Query(20, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Rank the group's notes by title and text, with a highlighted snippet."""
+    return notes_crud.search_notes(db, caller_group(user, group_id), q, limit)
@@ -1,59 +1,335 @@
+import json
 from datetime import datetime, timezone
+from typing import Iterator, Optional
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.core.auth import caller_group, get_current_user, get_optional_user
+from app.core.broadcaster import broadcaster
+from app.core.conditional import make_etag, not_modified, validator_headers
+from app.core.pagination import MAX_PAGE_SIZE, page_size, set_next_page
+from app.database import SessionLocal, after_commit, get_db
 from app.crud import sync as sync_crud
+from app.crud.sync import BatchOutcome, alarm_fire_time
+from app.jobs.alarms import alarm_scheduler
 from app.schemas.sync import (
     AckRequest,
     RemoteNote,
+    SyncChangesResponse,
     SyncEventResponse,
+    SyncSendBatchRequest,
+    SyncSendBatchResponse,
     SyncSendRequest,
+    SyncSendResult,
 )
+from app.schemas.auth import CurrentUser
 from app import models
 
 router = APIRouter(prefix="/sync", tags=["sync"])
 
+SEND_BATCH_MAX_ITEMS = 1000
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[int]:
+    return int(value.timestamp()) if value is not None else None
+
+
+def _event_response(
+    event: models.SyncEvent,
+    note: models.Note,
+    base_event_id: Optional[int] = None,
+    patches: bool = False,
+    delivered: Optional[int] = None,
+) -> SyncEventResponse:
+    # O patch só serve se o cliente já tem a base_revision: o evento que a
+    # gerou está no que ele já recebeu (`delivered`, cursor ou watermark) e
+    # este ainda não. Sem essa prova (ou com a base compactada) vai o
+    # conteúdo todo.
+    send_patch = (
+        patches
+        and event.patch is not None
+        and event.revision == note.revision
+        and base_event_id is not None
+        and delivered is not None
+        and base_event_id <= delivered < event.id
+    )
+    return SyncEventResponse(
+        event_id=str(event.id),
+        event_type=event.event_type or "note",
+        note=RemoteNote(
+            id=note.client_note_id,
+            title=note.title,
+            content="" if send_patch else note.content or "",
+            updated_at=int(event.updated_at.timestamp()),
+            deleted=note.deleted,
+            created_by_user_id=str(note.created_by_user_id or ""),
+            target_user_id=str(note.source_user_id or ""),
+            group_id=str(note.group_id or ""),
+            revision=note.revision,
+            content_hash=note.content_hash,
+            base_revision=event.base_revision if send_patch else None,
+            patch=json.loads(event.patch) if send_patch else None,
+            alarm_at=_timestamp(note.alarm_at),
+            snooze_until=_timestamp(note.snooze_until),
+        ),
+    )
+
+
+def _check_send(payload: SyncSendRequest) -> None:
+    if payload.patch is None and payload.content is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either content or patch is required",
+        )
+    if payload.patch is not None and payload.base_revision is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="base_revision is required with patch",
+        )
+
+
+def _patch_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Patch base revision not available; resend full content",
+    )
+
+
+def _send_response(event: models.SyncEvent, note: models.Note) -> dict:
+    return {
+        "status": "applied",
+        "event_id": event.id,
+        "revision": note.revision,
+        "content_hash": note.content_hash,
+    }
+
+
+def _remote_note(note: models.Note) -> RemoteNote:
+    return RemoteNote(
+        id=note.client_note_id,
+        title=note.title,
+        content=note.content or "",
+        updated_at=int(note.updated_at.timestamp()),
+        deleted=note.deleted,
+        created_by_user_id=str(note.created_by_user_id or ""),
+        target_user_id=str(note.source_user_id or ""),
+        group_id=str(note.group_id or ""),
+        revision=note.revision,
+        content_hash=note.content_hash,
+        alarm_at=_timestamp(note.alarm_at),
+        snooze_until=_timestamp(note.snooze_until),
+    )
+
+
+def _reschedule_alarm(db, note: models.Note) -> None:
+    # Depois do commit: o agendador não deve ver um alarme que foi desfeito.
+    fire_at = alarm_fire_time(note.alarm_at, note.snooze_until, note.deleted)
+    after_commit(db, alarm_scheduler.reschedule, note.id, fire_at)
+
+
+def _reschedule_alarms(db, outcome: BatchOutcome) -> None:
+    for note_id, fire_at in outcome.alarms:
+        after_commit(db, alarm_scheduler.reschedule, note_id, fire_at)
+
+
+def _rejected_response(note: models.Note) -> JSONResponse:
+    # 200 e não 409: o envio foi processado, só perdeu para a versão do
+    # servidor, que segue junto para o cliente adotar sem nova ida ao servidor.
+    return JSONResponse(
+        jsonable_encoder(
+            {
+                "status": "rejected",
+                "event_id": None,
+                "revision": note.revision,
+                "content_hash": note.content_hash,
+                "note": _remote_note(note),
+            }
+        )
+    )
+
+
+def _check_batch_size(payload: SyncSendBatchRequest) -> None:
+    if len(payload.items) > SEND_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {SEND_BATCH_MAX_ITEMS} items per batch",
+        )
+    if any(item.content is None or item.patch is not None for item in payload.items):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Batch items must carry full content",
+        )
+
+
+def _batch_status(index: int, event_id: Optional[int], outcome: BatchOutcome) -> str:
+    if event_id is not None:
+        return "applied"
+    return "rejected" if index in outcome.rejected else "superseded"
+
+
+def _batch_response(payload: SyncSendBatchRequest, outcome: BatchOutcome) -> SyncSendBatchResponse:
+    return SyncSendBatchResponse(
+        results=[
+            SyncSendResult(
+                id=item.id,
+                group_id=item.group_id,
+                status=_batch_status(index, event_id, outcome),
+                event_id=str(event_id) if event_id is not None else None,
+                note=_remote_note(outcome.rejected[index]) if index in outcome.rejected else None,
+            )
+            for index, (item, event_id) in enumerate(zip(payload.items, outcome.event_ids))
+        ]
+    )
+
+
+def _changes_response(rows: list, cursor: int, has_more: bool, patches: bool) -> SyncChangesResponse:
+    return SyncChangesResponse(
+        events=[_event_response(event, note, base_event_id, patches, cursor) for event, note, base_event_id in rows],
+        next_cursor=str(rows[-1][0].id if rows else cursor),
+        has_more=has_more,
+    )
+
+
+def _stream_updates(
+    since: datetime,
+    group_id: Optional[int],
+    patches: bool,
+    delivered: Optional[int],
+    after: Optional[tuple],
+    through: tuple,
+) -> Iterator[bytes]:
+    # A sessão pertence ao gerador: o corpo é enviado depois que a rota retorna.
+    with SessionLocal() as db:
+        yield b"["
+        first = True
+        for event, note, base_event_id in sync_crud.get_events_since(db, since, group_id, after, through):
+            item = json.dumps(jsonable_encoder(_event_response(event, note, base_event_id, patches, delivered)))
+            yield (item if first else "," + item).encode("utf-8")
+            first = False
+        yield b"]"
+
 
 @router.post("/send", status_code=status.HTTP_201_CREATED)
 def send_note(payload: SyncSendRequest, db: Session = Depends(get_db)):
-    note = sync_crud.upsert_note(db=db, payload=payload)
-    event = sync_crud.create_sync_event(db=db, note=note, payload=payload)
-    return {"event_id": event.id}
+    _check_send(payload)
+    previous = None
+    if payload.patch is not None:
+        note = sync_crud.apply_note_patch(db=db, payload=payload)
+        if note is None:
+            raise _patch_conflict()
+    else:
+        previous = sync_crud.get_previous_content(db, payload)
+        note = sync_crud.upsert_note(db=db, payload=payload)
+        if note is None:
+            return _rejected_response(sync_crud.get_note(db, payload))
+    event = sync_crud.create_sync_event(db=db, note=note, payload=payload, previous=previous)
+    # Só acorda os assinantes depois do commit, senão eles leem o feed sem o evento.
+    after_commit(db, broadcaster.publish, event.group_id)
+    _reschedule_alarm(db, note)
+    return _send_response(event, note)
+
+
+@router.post("/send-batch", response_model=SyncSendBatchResponse, status_code=status.HTTP_201_CREATED)
+def send_batch(payload: SyncSendBatchRequest, db: Session = Depends(get_db)):
+    _check_batch_size(payload)
+    outcome = sync_crud.send_batch(db, payload.items)
+    for group_id in outcome.group_ids:
+        after_commit(db, broadcaster.publish, group_id)
+    _reschedule_alarms(db, outcome)
+    return _batch_response(payload, outcome)
+
+
+def _updates_etag(
+    since: float,
+    group_id: Optional[int],
+    patches: bool,
+    delivered: Optional[int],
+    cursor: Optional[str],
+    limit: int,
+    version,
+) -> str:
+    count, max_id, _ = version
+    return make_etag("updates", since, group_id, patches, delivered, cursor, limit, count, max_id)
 
 
 @router.get("/updates", response_model=list[SyncEventResponse])
 def get_updates(
+    request: Request,
     since: float = Query(..., description="Timestamp UNIX para filtrar eventos"),
+    group_id: Optional[int] = Query(None, description="Restringe aos eventos do grupo"),
+    patches: bool = Query(False, description="Aceita patches no lugar do conteúdo completo"),
+    client_id: Optional[str] = Query(None, max_length=64, description="client_id do /sync/ack (patches)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor da página anterior"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Sem cursor nem limit: tudo"),
     db: Session = Depends(get_db),
 ):
     since_dt = datetime.fromtimestamp(since, tz=timezone.utc)
-    events = sync_crud.get_events_since(db, since_dt)
-    responses: list[SyncEventResponse] = []
-    for event in events:
-        note = db.query(models.Note).filter(models.Note.id == event.note_id).first()
-        if not note:
-            continue
-        responses.append(
-            SyncEventResponse(
-                event_id=str(event.id),
-                note=RemoteNote(
-                    id=note.geometry or str(note.id),
-                    title=note.title,
-                    content=note.content or "",
-                    updated_at=int(event.updated_at.timestamp()),
-                    deleted=note.deleted,
-                    created_by_user_id=str(note.created_by_user_id or ""),
-                    target_user_id=str(note.source_user_id or ""),
-                    group_id=str(note.group_id or ""),
-                ),
-            )
-        )
-    return responses
+    # Sem cursor nem limit: resposta inteira, como o cliente WPF espera.
+    limit = page_size(cursor, limit, MAX_PAGE_SIZE)
+    delivered = sync_crud.get_client_watermark(db, client_id) if patches and client_id else None
+    version = sync_crud.get_updates_version(db, since_dt, group_id)
+    etag = _updates_etag(since, group_id, patches, delivered, cursor, limit, version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    after = through = next_cursor = None
+    if limit is not None:
+        after, through, next_cursor = sync_crud.get_updates_page(db, since_dt, group_id, cursor, limit)
+        if through is None:
+            return JSONResponse([], headers=validator_headers(etag))
+    response = StreamingResponse(
+        _stream_updates(since_dt, group_id, patches, delivered, after, through),
+        media_type="application/json",
+        headers=validator_headers(etag),
+    )
+    set_next_page(request, response, next_cursor)
+    return response
+
+
+@router.get("/changes", response_model=SyncChangesResponse)
+def get_changes(
+    group_id: Optional[int] = Query(None, description="Grupo do cliente (padrão: o do usuário)"),
+    cursor: int = Query(0, ge=0, description="next_cursor da página anterior (0 = início)"),
+    limit: int = Query(200, ge=1, le=1000),
+    patches: bool = Query(False, description="Aceita patches no lugar do conteúdo completo"),
+    user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    group_id = caller_group(user, group_id)
+    rows, has_more = sync_crud.get_changes(db, group_id, cursor, limit)
+    return _changes_response(rows, cursor, has_more, patches)
+
+
+def _ack_client(payload: AckRequest, user: Optional[CurrentUser]) -> Optional[str]:
+    # Clientes antigos mandam só event_ids; o usuário autenticado vira a chave.
+    if payload.client_id:
+        return payload.client_id
+    if user is not None:
+        return f"user:{user.id}"
+    return None
 
 
 @router.post("/ack")
-def acknowledge(payload: AckRequest, db: Session = Depends(get_db)):
-    removed = sync_crud.delete_events(db, payload.event_ids)
-    return {"deleted": removed}
+def acknowledge(
+    payload: AckRequest,
+    db: Session = Depends(get_db),
+    user: Optional[CurrentUser] = Depends(get_optional_user),
+):
+    """
+    Record delivery of the given events. Nothing is deleted here: the ack
+    moves the client's watermark and compaction reclaims the rows later.
+    """
+    client_id = _ack_client(payload, user)
+    watermark = None
+    if client_id is not None:
+        watermark = sync_crud.record_ack(
+            db,
+            client_id,
+            payload.event_ids,
+            user_id=user.id if user else None,
+            group_id=user.group_id if user else None,
+        )
+    return {"acknowledged": len(payload.event_ids), "watermark": watermark}
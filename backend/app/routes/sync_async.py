@@ -0,0 +1,159 @@
+"""
+/sync routes on the async database stack (DATABASE_ASYNC=1). Same paths,
+payloads and responses as app.routes.sync, but handlers await an
+AsyncSession instead of occupying a threadpool worker.
+"""
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import caller_group, get_current_user, get_optional_user
+from app.core.broadcaster import broadcaster
+from app.core.conditional import not_modified, validator_headers
+from app.core.pagination import MAX_PAGE_SIZE, page_size, set_next_page
+from app.crud import sync_async as sync_crud
+from app.database import AsyncSessionLocal, after_commit, get_async_db
+from app.routes.sync import (
+    _ack_client,
+    _batch_response,
+    _changes_response,
+    _check_batch_size,
+    _check_send,
+    _event_response,
+    _patch_conflict,
+    _rejected_response,
+    _reschedule_alarm,
+    _reschedule_alarms,
+    _send_response,
+    _updates_etag,
+)
+from app.schemas.sync import (
+    AckRequest,
+    SyncChangesResponse,
+    SyncEventResponse,
+    SyncSendBatchRequest,
+    SyncSendBatchResponse,
+    SyncSendRequest,
+)
+from app.schemas.auth import CurrentUser
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+async def _stream_updates(
+    since: datetime,
+    group_id: Optional[int],
+    patches: bool,
+    delivered: Optional[int],
+    after: Optional[tuple],
+    through: tuple,
+) -> AsyncIterator[bytes]:
+    async with AsyncSessionLocal() as db:
+        yield b"["
+        first = True
+        async for event, note, base_event_id in sync_crud.get_events_since(db, since, group_id, after, through):
+            item = json.dumps(jsonable_encoder(_event_response(event, note, base_event_id, patches, delivered)))
+            yield (item if first else "," + item).encode("utf-8")
+            first = False
+        yield b"]"
+
+
+@router.post("/send", status_code=status.HTTP_201_CREATED)
+async def send_note(payload: SyncSendRequest, db: AsyncSession = Depends(get_async_db)):
+    _check_send(payload)
+    previous = None
+    if payload.patch is not None:
+        note = await sync_crud.apply_note_patch(db=db, payload=payload)
+        if note is None:
+            raise _patch_conflict()
+    else:
+        previous = await sync_crud.get_previous_content(db, payload)
+        note = await sync_crud.upsert_note(db=db, payload=payload)
+        if note is None:
+            return _rejected_response(await sync_crud.get_note(db, payload))
+    event = await sync_crud.create_sync_event(db=db, note=note, payload=payload, previous=previous)
+    after_commit(db, broadcaster.publish, event.group_id)
+    _reschedule_alarm(db, note)
+    return _send_response(event, note)
+
+
+@router.post("/send-batch", response_model=SyncSendBatchResponse, status_code=status.HTTP_201_CREATED)
+async def send_batch(payload: SyncSendBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    _check_batch_size(payload)
+    outcome = await sync_crud.send_batch(db, payload.items)
+    for group_id in outcome.group_ids:
+        after_commit(db, broadcaster.publish, group_id)
+    _reschedule_alarms(db, outcome)
+    return _batch_response(payload, outcome)
+
+
+@router.get("/updates", response_model=list[SyncEventResponse])
+async def get_updates(
+    request: Request,
+    since: float = Query(..., description="Timestamp UNIX para filtrar eventos"),
+    group_id: Optional[int] = Query(None, description="Restringe aos eventos do grupo"),
+    patches: bool = Query(False, description="Aceita patches no lugar do conteúdo completo"),
+    client_id: Optional[str] = Query(None, max_length=64, description="client_id do /sync/ack (patches)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor da página anterior"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Sem cursor nem limit: tudo"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    since_dt = datetime.fromtimestamp(since, tz=timezone.utc)
+    # Sem cursor nem limit: resposta inteira, como o cliente WPF espera.
+    limit = page_size(cursor, limit, MAX_PAGE_SIZE)
+    delivered = await sync_crud.get_client_watermark(db, client_id) if patches and client_id else None
+    version = await sync_crud.get_updates_version(db, since_dt, group_id)
+    etag = _updates_etag(since, group_id, patches, delivered, cursor, limit, version)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    after = through = next_cursor = None
+    if limit is not None:
+        after, through, next_cursor = await sync_crud.get_updates_page(db, since_dt, group_id, cursor, limit)
+        if through is None:
+            return JSONResponse([], headers=validator_headers(etag))
+    response = StreamingResponse(
+        _stream_updates(since_dt, group_id, patches, delivered, after, through),
+        media_type="application/json",
+        headers=validator_headers(etag),
+    )
+    set_next_page(request, response, next_cursor)
+    return response
+
+
+@router.get("/changes", response_model=SyncChangesResponse)
+async def get_changes(
+    group_id: Optional[int] = Query(None, description="Grupo do cliente (padrão: o do usuário)"),
+    cursor: int = Query(0, ge=0, description="next_cursor da página anterior (0 = início)"),
+    limit: int = Query(200, ge=1, le=1000),
+    patches: bool = Query(False, description="Aceita patches no lugar do conteúdo completo"),
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    group_id = caller_group(user, group_id)
+    rows, has_more = await sync_crud.get_changes(db, group_id, cursor, limit)
+    return _changes_response(rows, cursor, has_more, patches)
+
+
+@router.post("/ack")
+async def acknowledge(
+    payload: AckRequest,
+    db: AsyncSession = Depends(get_async_db),
+    user: Optional[CurrentUser] = Depends(get_optional_user),
+):
+    client_id = _ack_client(payload, user)
+    watermark = None
+    if client_id is not None:
+        watermark = await sync_crud.record_ack(
+            db,
+            client_id,
+            payload.event_ids,
+            user_id=user.id if user else None,
+            group_id=user.group_id if user else None,
+        )
+    return {"acknowledged": len(payload.event_ids), "watermark": watermark}
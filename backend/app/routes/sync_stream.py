@@ -0,0 +1,94 @@
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.auth import caller_group, get_current_user
+from app.core.broadcaster import broadcaster
+from app.crud import sync as sync_crud
+from app.database import DATABASE_ASYNC, AsyncSessionLocal, SessionLocal
+from app.routes.sync import _event_response
+from app.schemas.auth import CurrentUser
+
+if DATABASE_ASYNC:
+    from app.crud import sync_async as sync_async_crud
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+STREAM_PAGE_SIZE = 200
+KEEPALIVE_SECONDS = 15
+
+
+def _serialize(rows, patches: bool, cursor: int) -> List[Tuple[int, str, str]]:
+    """(event id, SSE event name, data) per row; the name is the event_type."""
+    return [
+        (
+            event.id,
+            event.event_type or "note",
+            json.dumps(jsonable_encoder(_event_response(event, note, base_event_id, patches, cursor))),
+        )
+        for event, note, base_event_id in rows
+    ]
+
+
+def _load_changes(group_id: int, cursor: int, patches: bool) -> Tuple[List[Tuple[int, str, str]], bool]:
+    with SessionLocal() as db:
+        rows, has_more = sync_crud.get_changes(db, group_id, cursor, STREAM_PAGE_SIZE)
+        return _serialize(rows, patches, cursor), has_more
+
+
+async def _load_changes_async(group_id: int, cursor: int, patches: bool) -> Tuple[List[Tuple[int, str, str]], bool]:
+    async with AsyncSessionLocal() as db:
+        rows, has_more = await sync_async_crud.get_changes(db, group_id, cursor, STREAM_PAGE_SIZE)
+        return _serialize(rows, patches, cursor), has_more
+
+
+async def _event_stream(request: Request, group_id: int, cursor: int, patches: bool) -> AsyncIterator[bytes]:
+    # Inscreve antes do replay para não perder eventos gravados no meio dele.
+    subscription = broadcaster.subscribe(group_id)
+    try:
+        while True:
+            if DATABASE_ASYNC:
+                events, has_more = await _load_changes_async(group_id, cursor, patches)
+            else:
+                events, has_more = await run_in_threadpool(_load_changes, group_id, cursor, patches)
+            for event_id, event_type, data in events:
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n".encode("utf-8")
+                cursor = event_id
+            if has_more:
+                continue
+            try:
+                await asyncio.wait_for(subscription.wait(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield b": ping\n\n"
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    group_id: Optional[int] = Query(None, description="Grupo do cliente (padrão: o do usuário)"),
+    cursor: int = Query(0, ge=0, description="Último event_id recebido"),
+    patches: bool = Query(False, description="Aceita patches no lugar do conteúdo completo"),
+    last_event_id: Optional[str] = Header(None),
+    user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Server-Sent Events feed of the group's sync events. On reconnect the
+    stream resumes after `Last-Event-ID` (or `cursor`) before going live.
+    """
+    group_id = caller_group(user, group_id)
+    if last_event_id and last_event_id.isdigit():
+        cursor = max(cursor, int(last_event_id))
+    return StreamingResponse(
+        _event_stream(request, group_id, cursor, patches),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,75 +1,175 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Iterator, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import SessionLocal, after_commit, get_db
 from app.schemas.users import (
+    UserImportRow,
     UserRegister,
     UserRegisterResponse,
     UserResponse,
     UserUpdate,
 )
-from app.core.security import hash_password, create_access_token
+from app.core.auth import invalidate_user
+from app.core.bulk import NDJSON, ParsedRow, chunks, ndjson_lines, outcome, parse_rows
+from app.core.conditional import apply_validators, make_etag, not_modified
+from app.core.pagination import MAX_PAGE_SIZE, page_size, set_next_page
+from app.core.security import hash_password_async, hash_passwords, create_access_token
 from app.crud import users as users_crud, groups as groups_crud, auth as auth_crud
 from app import models
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+def _create_user(payload: UserRegister, password_hash: str) -> UserRegisterResponse:
+    # Sessão própria, aberta só depois do hash (como no /auth/login)
+    with SessionLocal() as db:
+        group = groups_crud.get_group(db, payload.group_id)
+        if not group:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+
+        if auth_crud.get_user_by_email(db, payload.email.lower()):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+
+        user = models.User(
+            name=payload.name,
+            email=payload.email.lower(),
+            phone=payload.phone,
+            password_hash=password_hash,
+            is_admin=payload.is_admin,
+            group_id=payload.group_id,
+        )
+        users_crud.save_user(db, user)
+        db.commit()
+
+        token = create_access_token({"sub": str(user.id), "email": user.email})
+        return UserRegisterResponse(
+            id=user.id,
+            group_id=user.group_id,
+            email=user.email,
+            access_token=token,
+        )
+
+
 @router.post("/register", response_model=UserRegisterResponse, status_code=status.HTTP_201_CREATED)
-def register_user(payload: UserRegister, db: Session = Depends(get_db)):
-    group = groups_crud.get_group(db, payload.group_id)
-    if not group:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
-
-    if auth_crud.get_user_by_email(db, payload.email.lower()):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-
-    user = models.User(
-        name=payload.name,
-        email=payload.email.lower(),
-        phone=payload.phone,
-        password_hash=hash_password(payload.password),
-        is_admin=payload.is_admin,
-        group_id=payload.group_id,
-    )
-    users_crud.save_user(db, user)
-
-    token = create_access_token({"sub": str(user.id), "email": user.email})
-    return UserRegisterResponse(
-        id=user.id,
-        group_id=user.group_id,
-        email=user.email,
-        access_token=token,
-    )
+async def register_user(payload: UserRegister):
+    password_hash = await hash_password_async(payload.password)
+    return await run_in_threadpool(_create_user, payload, password_hash)
+
+
+def _check_group(group_id: int) -> None:
+    with SessionLocal() as db:
+        if not groups_crud.get_group(db, group_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
+
+
+def _import_users(group_id: int, rows: List[ParsedRow]) -> Iterator[dict]:
+    # A sessão pertence ao gerador: cada lote é gravado enquanto o relatório sai.
+    with SessionLocal() as db:
+        emails = {row.email.lower() for _, row in rows if not isinstance(row, str)}
+        taken = users_crud.existing_emails(db, emails)
+        seen, pending = set(), []
+        for number, row in rows:
+            if isinstance(row, str):
+                yield outcome(number, "invalid", detail=row)
+                continue
+            email = row.email.lower()
+            if email in taken:
+                yield outcome(number, "exists", email)
+            elif email in seen:
+                yield outcome(number, "duplicate", email)
+            else:
+                seen.add(email)
+                pending.append((number, row))
+
+        for batch in chunks(pending):
+            hashes = hash_passwords([row.password for _, row in batch])
+            users = [
+                {
+                    "name": row.name,
+                    "email": row.email.lower(),
+                    "phone": row.phone,
+                    "password_hash": password_hash,
+                    "is_admin": row.is_admin,
+                }
+                for (_, row), password_hash in zip(batch, hashes)
+            ]
+            created = users_crud.insert_users(db, group_id, users)
+            db.commit()
+            for number, row in batch:
+                email = row.email.lower()
+                if email in created:
+                    yield outcome(number, "created", email, id=created[email])
+                else:
+                    yield outcome(number, "exists", email)
+
+
+@router.post("/import", response_class=StreamingResponse)
+async def import_users(request: Request, group_id: int = Query(..., description="Grupo dos usuários importados")):
+    """
+    Create many users from a JSON list or a CSV (name,email,phone,password,is_admin).
+    Streams one NDJSON line per row (created | exists | duplicate | invalid)
+    and a final summary.
+    """
+    rows = parse_rows(await request.body(), request.headers.get("content-type", ""), UserImportRow)
+    await run_in_threadpool(_check_group, group_id)
+    return StreamingResponse(ndjson_lines(_import_users(group_id, rows)), media_type=NDJSON)
 
 
 @router.get("/by-group/{group_id}", response_model=list[UserResponse])
-def users_by_group(group_id: int, db: Session = Depends(get_db)):
-    return users_crud.list_users_by_group(db, group_id)
+def users_by_group(
+    group_id: int,
+    request: Request,
+    response: Response,
+    cursor: str | None = Query(None, description="X-Next-Cursor da página anterior"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Sem cursor nem limit: lista inteira"),
+    db: Session = Depends(get_db),
+):
+    limit = page_size(cursor, limit)
+    count, max_updated_at, max_id = users_crud.group_version(db, group_id)
+    etag = make_etag("users", group_id, cursor, limit, count, max_updated_at, max_id)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    users, next_cursor = users_crud.list_users_by_group(db, group_id, cursor, limit, etag)
+    apply_validators(response, etag)
+    set_next_page(request, response, next_cursor)
+    return users
 
 
-@router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, payload: UserUpdate, db: Session = Depends(get_db)):
-    user = users_crud.get_user(db, user_id)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+def _update_user(user_id: int, payload: UserUpdate, password_hash: str | None) -> UserResponse:
+    with SessionLocal() as db:
+        user = users_crud.get_user(db, user_id)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+        if payload.name is not None:
+            user.name = payload.name
+        if payload.email is not None:
+            existing = auth_crud.get_user_by_email(db, payload.email.lower())
+            if existing and existing.id != user_id:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use")
+            user.email = payload.email.lower()
+        if payload.phone is not None:
+            user.phone = payload.phone
+        if payload.is_admin is not None:
+            user.is_admin = payload.is_admin
+        if password_hash is not None:
+            user.password_hash = password_hash
 
-    if payload.name is not None:
-        user.name = payload.name
-    if payload.email is not None:
-        existing = auth_crud.get_user_by_email(db, payload.email.lower())
-        if existing and existing.id != user_id:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use")
-        user.email = payload.email.lower()
-    if payload.phone is not None:
-        user.phone = payload.phone
-    if payload.is_admin is not None:
-        user.is_admin = payload.is_admin
-    if payload.password:
-        user.password_hash = hash_password(payload.password)
+        users_crud.save_user(db, user)
+        after_commit(db, invalidate_user, user_id)
+        db.commit()
+        return UserResponse.from_orm(user)
 
-    users_crud.save_user(db, user)
-    return user
+
+@router.put("/{user_id}", response_model=UserResponse)
+async def update_user(user_id: int, payload: UserUpdate):
+    password_hash = await hash_password_async(payload.password) if payload.password else None
+    return await run_in_threadpool(_update_user, user_id, payload, password_hash)
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -78,4 +178,5 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     users_crud.delete_user(db, user)
+    after_commit(db, invalidate_user, user_id)
     return {"status": "deleted"}
@@ -17,3 +17,14 @@ class LoginResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
     user: UserInfo
+
+
+class CurrentUser(BaseModel):
+    id: int
+    name: str
+    email: EmailStr
+    group_id: int | None = None
+    is_admin: bool = False
+
+    class Config:
+        orm_mode = True
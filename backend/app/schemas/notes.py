@@ -0,0 +1,12 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class NoteSearchResult(BaseModel):
+    id: str  # id da nota no cliente
+    title: Optional[str] = None
+    snippet: Optional[str] = None  # trecho em HTML escapado, termos entre <b></b>
+    rank: float  # maior = mais relevante
+    updated_at: int
+    revision: Optional[int] = None
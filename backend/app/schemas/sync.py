@@ -1,17 +1,30 @@
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.core.textpatch import PatchOp
 
 
 class SyncSendRequest(BaseModel):
-    id: str
+    id: str = Field(..., max_length=64)  # notes.client_note_id
     title: Optional[str] = None
-    content: str
+    content: Optional[str] = None  # obrigatório quando não há patch
     updated_at: int
     target_user_id: str
     created_by_user_id: str
     group_id: str
     deleted: bool = False
+    # Envio por patch: operações sobre o conteúdo da revisão base_revision
+    base_revision: Optional[int] = None
+    patch: Optional[List[PatchOp]] = None
+    content_hash: Optional[str] = None  # sha256 esperado após aplicar o patch
+    # Alarme em epoch (s). Ausente = mantém o do servidor; null/0 = desliga.
+    alarm_at: Optional[int] = None
+    snooze_until: Optional[int] = None
+
+
+class SyncSendBatchRequest(BaseModel):
+    items: List[SyncSendRequest]
 
 
 class RemoteNote(BaseModel):
@@ -23,12 +36,41 @@ class RemoteNote(BaseModel):
     target_user_id: str
     group_id: str
     deleted: bool = False
+    revision: Optional[int] = None
+    content_hash: Optional[str] = None
+    # Com patches=1: content vem vazio e patch leva da base_revision à revision
+    base_revision: Optional[int] = None
+    patch: Optional[List[PatchOp]] = None
+    alarm_at: Optional[int] = None
+    snooze_until: Optional[int] = None
+
+
+class SyncSendResult(BaseModel):
+    id: str
+    group_id: str
+    status: str  # applied | superseded | rejected
+    event_id: Optional[str] = None
+    # rejected: versão do servidor que venceu (updated_at igual ou mais novo)
+    note: Optional[RemoteNote] = None
+
+
+class SyncSendBatchResponse(BaseModel):
+    results: List[SyncSendResult]
 
 
 class SyncEventResponse(BaseModel):
     event_id: str
+    event_type: str = "note"  # note | alarm_due
     note: RemoteNote
 
 
+class SyncChangesResponse(BaseModel):
+    events: List[SyncEventResponse]
+    next_cursor: str
+    has_more: bool = False
+
+
 class AckRequest(BaseModel):
     event_ids: List[str]
+    # Id estável do dispositivo; sem ele o watermark fica por usuário
+    client_id: Optional[str] = Field(None, max_length=64)
@@ -11,6 +11,16 @@ class UserRegister(BaseModel):
     is_admin: bool = False
 
 
+class UserImportRow(BaseModel):
+    """One row of POST /users/import (JSON object or CSV line)."""
+
+    name: str
+    email: EmailStr
+    phone: str | None = None
+    password: str
+    is_admin: bool = False
+
+
 class UserResponse(BaseModel):
     id: int
     group_id: int | None
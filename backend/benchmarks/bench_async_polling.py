@@ -0,0 +1,98 @@
+"""
+Carga de polling concorrente em GET /sync/updates: modo síncrono
+(threadpool) contra modo assíncrono (DATABASE_ASYNC=1).
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_async_polling --clients 50 --duration 10
+
+Cada modo sobe um uvicorn próprio sobre o mesmo banco semeado. Sem
+DATABASE_URL definido, usa um SQLite temporário.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.bench_sync_updates import seed
+from benchmarks.harness import percentile
+
+BASE_URL = "http://127.0.0.1:{port}"
+
+
+def start_server(port: int, async_mode: bool) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_ASYNC="1" if async_mode else "0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            httpx.get(BASE_URL.format(port=port) + "/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("uvicorn não subiu a tempo")
+
+
+async def poller(client: httpx.AsyncClient, since: float, stop_at: float, timings: list, errors: list) -> None:
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        try:
+            response = await client.get("/sync/updates", params={"since": since})
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            errors.append(exc)
+            continue
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+async def run_load(port: int, clients: int, duration: float, since: float) -> tuple[list, list]:
+    timings: list = []
+    errors: list = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=BASE_URL.format(port=port), limits=limits, timeout=30) as client:
+        stop_at = time.perf_counter() + duration
+        await asyncio.gather(*(poller(client, since, stop_at, timings, errors) for _ in range(clients)))
+    return timings, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--events", type=int, default=200, help="backlog semeado")
+    parser.add_argument("--since", type=float, default=0, help="'since' usado pelos clientes")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    seed(args.events, max(1, args.events // 2))
+    print(f"{'modo':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6}")
+    for async_mode in (False, True):
+        process = start_server(args.port, async_mode)
+        try:
+            timings, errors = asyncio.run(run_load(args.port, args.clients, args.duration, args.since))
+        finally:
+            process.terminate()
+            process.wait()
+        if not timings:
+            print(f"{'async' if async_mode else 'sync':>6} sem respostas ({len(errors)} erros)")
+            continue
+        print(
+            f"{'async' if async_mode else 'sync':>6} "
+            f"{len(timings) / args.duration:>8.1f} "
+            f"{statistics.median(timings):>8.1f} "
+            f"{percentile(timings, 95):>8.1f} "
+            f"{percentile(timings, 99):>8.1f} "
+            f"{len(errors):>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Carga mista sobre app.main:app: /sync/send, /sync/updates, /sync/ack,
+/auth/login e o fluxo de convite, com clientes concorrentes.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_sync_mix --groups 5 --users 10 --notes 200 --events 3 \\
+        --clients 20 --requests 2000 --mix send=30,updates=40,ack=15,login=5,invite=10
+
+Relata p50/p95/p99, vazão e queries por requisição de cada operação.
+--save-baseline grava benchmarks/baselines/<nome>.json; sem ele o resultado
+é comparado com esse arquivo (se existir) e a saída é 1 quando há regressão.
+
+O app roda no mesmo processo (httpx.ASGITransport), o que permite contar as
+queries de cada requisição. Sem DATABASE_URL definido, usa um SQLite
+temporário; aponte DATABASE_URL para um Postgres local para medir nele.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from benchmarks.harness import (
+    QueryCounter,
+    compare,
+    load_baseline,
+    save_baseline,
+    summarize,
+    use_temp_database,
+)
+
+use_temp_database()
+
+import httpx  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.core.security import hash_password  # noqa: E402
+from app.database import DATABASE_ASYNC, Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+PASSWORD = "bench-password"
+CONTENT = "<FlowDocument><Paragraph>" + ("lorem ipsum " * 100) + "</Paragraph></FlowDocument>"
+DEFAULT_MIX = "send=30,updates=40,ack=15,login=5,invite=10"
+# updated_at dos envios: acima de qualquer valor semeado, e sempre crescente
+# para que o envio vença o conflito por updated_at.
+SEND_EPOCH = 2_000_000_000
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"send", "updates", "ack", "login", "invite"}
+    if unknown:
+        raise SystemExit(f"operações desconhecidas em --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def seed(groups: int, users: int, notes: int, events: int) -> list:
+    """
+    Recreate the schema and bulk-insert `groups` groups, each with `users`
+    users, `notes` notes and `events` sync events per note. Returns
+    (group_id, [emails]) per group.
+    """
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    password_hash = hash_password(PASSWORD)
+    base = datetime(2024, 1, 1)
+    world = []
+    with SessionLocal() as db:
+        group_ids = db.scalars(
+            insert(models.Group).returning(models.Group.id, sort_by_parameter_order=True),
+            [{"name": f"bench-{g}"} for g in range(groups)],
+        ).all()
+        for g, group_id in enumerate(group_ids):
+            emails = [f"user{g}-{u}@bench.example.com" for u in range(users)]
+            db.execute(
+                insert(models.User),
+                [
+                    {"name": email, "email": email, "password_hash": password_hash, "group_id": group_id}
+                    for email in emails
+                ],
+            )
+            if notes:
+                db.execute(
+                    insert(models.Note),
+                    [
+                        {
+                            "group_id": group_id,
+                            "client_note_id": f"seed-{n}",
+                            "title": f"Nota {n}",
+                            "content": CONTENT,
+                            "revision": events,
+                            "deleted": False,
+                            "updated_at": base + timedelta(seconds=events),
+                        }
+                        for n in range(notes)
+                    ],
+                )
+            note_ids = db.scalars(select(models.Note.id).where(models.Note.group_id == group_id)).all()
+            if note_ids and events:
+                db.execute(
+                    insert(models.SyncEvent),
+                    [
+                        {
+                            "note_id": note_id,
+                            "group_id": group_id,
+                            "event_type": "note",
+                            "updated_at": base + timedelta(seconds=e + 1),
+                            "revision": e + 1,
+                        }
+                        for note_id in note_ids
+                        for e in range(events)
+                    ],
+                )
+            world.append((group_id, emails))
+        db.commit()
+    return world
+
+
+class Recorder:
+    def __init__(self, client: httpx.AsyncClient, counter: QueryCounter) -> None:
+        self.client = client
+        self.counter = counter
+        self.timings = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._ids = itertools.count()
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        request_id = str(next(self._ids))
+        headers = dict(kwargs.pop("headers", {}), **{"X-Bench-Id": request_id})
+        start = time.perf_counter()
+        response = await self.client.request(method, url, headers=headers, **kwargs)
+        self.timings[name].append((time.perf_counter() - start) * 1000)
+        self.queries[name].append(self.counter.pop(request_id))
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+
+class VirtualClient:
+    """One device: polls, edits its notes, acknowledges and logs in again."""
+
+    def __init__(self, index: int, group_id: int, email: str, notes: int, rng: random.Random) -> None:
+        self.index = index
+        self.group_id = group_id
+        self.email = email
+        self.notes = max(1, notes)
+        self.rng = rng
+        self.headers = {}
+        self.since = 0.0
+        self.event_ids = []
+
+    async def login(self, rec: Recorder) -> None:
+        response = await rec.request("login", "POST", "/auth/login", json={"email": self.email, "password": PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": "Bearer " + response.json()["access_token"]}
+
+    async def send(self, rec: Recorder, seq: int) -> None:
+        payload = {
+            "id": f"seed-{self.rng.randrange(self.notes)}",
+            "title": "bench",
+            "content": CONTENT + str(seq),
+            "updated_at": SEND_EPOCH + seq,
+            "created_by_user_id": "",
+            "target_user_id": "",
+            "group_id": str(self.group_id),
+        }
+        await rec.request("send", "POST", "/sync/send", json=payload)
+
+    async def updates(self, rec: Recorder) -> None:
+        response = await rec.request(
+            "updates", "GET", "/sync/updates", params={"since": self.since, "group_id": self.group_id}
+        )
+        if response.status_code == 200:
+            items = response.json()
+            self.event_ids = [item["event_id"] for item in items]
+            if items:
+                self.since = max(item["note"]["updated_at"] for item in items)
+
+    async def ack(self, rec: Recorder) -> None:
+        payload = {"event_ids": self.event_ids, "client_id": f"bench-{self.index}"}
+        await rec.request("ack", "POST", "/sync/ack", json=payload, headers=self.headers)
+
+    async def invite(self, rec: Recorder, seq: int) -> None:
+        response = await rec.request("invite_create", "POST", f"/groups/{self.group_id}/invite", json={})
+        if response.status_code != 200:
+            return
+        token = response.json()["token"]
+        await rec.request("invite_preview", "GET", f"/groups/invitations/{token}")
+        payload = {"name": "convidado", "email": f"invitee{seq}@bench.example.com"}
+        await rec.request("invite_accept", "POST", f"/groups/invitations/{token}/accept", json=payload)
+
+
+async def run_load(world: list, args, mix: dict) -> tuple:
+    counter = QueryCounter(*engines())
+    transport = httpx.ASGITransport(app=counter.as_asgi(app))
+    rng = random.Random(args.seed)
+    sequence = itertools.count(1)
+    names, weights = zip(*mix.items())
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        rec = Recorder(client, counter)
+        clients = []
+        for index in range(args.clients):
+            group_id, emails = world[index % len(world)]
+            vc = VirtualClient(index, group_id, emails[index % len(emails)], args.notes, random.Random(rng.random()))
+            await vc.login(rec)
+            clients.append(vc)
+        # O login inicial é preparação, não carga.
+        rec.timings.clear()
+        rec.queries.clear()
+        rec.errors.clear()
+
+        per_client = max(1, args.requests // args.clients)
+
+        async def drive(vc: VirtualClient) -> None:
+            for _ in range(per_client):
+                operation = vc.rng.choices(names, weights)[0]
+                if operation == "send":
+                    await vc.send(rec, next(sequence))
+                elif operation == "updates":
+                    await vc.updates(rec)
+                elif operation == "ack":
+                    await vc.ack(rec)
+                elif operation == "login":
+                    await vc.login(rec)
+                else:
+                    await vc.invite(rec, next(sequence))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(drive(vc) for vc in clients))
+        wall = time.perf_counter() - started
+    return rec, wall
+
+
+def engines() -> list:
+    found = [engine]
+    if DATABASE_ASYNC:
+        from app.database import async_engine
+
+        found.append(async_engine.sync_engine)
+    return found
+
+
+def print_report(report: dict, errors: dict) -> None:
+    print(f"{'operação':<16} {'reqs':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6} {'erros':>6}")
+    for name, op in report["operations"].items():
+        print(
+            f"{name:<16} {op['requests']:>6} {op['p50_ms']:>8.1f} {op['p95_ms']:>8.1f} "
+            f"{op['p99_ms']:>8.1f} {op['queries_per_request']:>6.1f} {errors.get(name, 0):>6}"
+        )
+    print(f"total {report['requests']} reqs em {report['seconds']} s → {report['throughput_rps']} req/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=5)
+    parser.add_argument("--users", type=int, default=10, help="usuários por grupo")
+    parser.add_argument("--notes", type=int, default=200, help="notas por grupo")
+    parser.add_argument("--events", type=int, default=3, help="eventos por nota")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default="sync_mix", help="nome do arquivo em benchmarks/baselines")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="folga no p95 antes de acusar regressão")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    world = seed(args.groups, args.users, args.notes, args.events)
+    rec, wall = asyncio.run(run_load(world, args, mix))
+
+    report = summarize(rec.timings, rec.queries, wall)
+    report["config"] = {
+        "groups": args.groups,
+        "users": args.users,
+        "notes": args.notes,
+        "events": args.events,
+        "clients": args.clients,
+        "requests": args.requests,
+        "mix": args.mix,
+        "seed": args.seed,
+        "dialect": engine.dialect.name,
+        "async": DATABASE_ASYNC,
+    }
+    report["errors"] = dict(rec.errors)
+
+    if args.json:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    else:
+        print_report(report, rec.errors)
+
+    if args.save_baseline:
+        print(f"baseline gravado em {save_baseline(args.baseline, report)}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        return
+    if baseline.get("config") != report["config"]:
+        print("aviso: baseline gravado com outra configuração; comparação só indicativa")
+    regressions = compare(baseline, report, args.tolerance)
+    for line in regressions:
+        print("REGRESSÃO", line)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
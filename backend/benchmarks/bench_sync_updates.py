@@ -0,0 +1,90 @@
+"""
+Latência de GET /sync/updates em função do tamanho do backlog.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_sync_updates --sizes 100 1000 5000 --repeat 5
+
+Sem DATABASE_URL definido, usa um SQLite temporário.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.harness import use_temp_database
+
+use_temp_database()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+CONTENT = "<FlowDocument><Paragraph>" + ("lorem ipsum " * 200) + "</Paragraph></FlowDocument>"
+
+
+def seed(events: int, notes: int) -> None:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    base = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        group = models.Group(name="bench")
+        db.add(group)
+        db.flush()
+        note_rows = [
+            models.Note(
+                group_id=group.id,
+                client_note_id=f"note-{i}",
+                title=f"Nota {i}",
+                content=CONTENT,
+                deleted=False,
+                updated_at=base,
+            )
+            for i in range(notes)
+        ]
+        db.add_all(note_rows)
+        db.flush()
+        db.bulk_save_objects(
+            [
+                models.SyncEvent(
+                    note_id=note_rows[i % notes].id,
+                    event_type="note",
+                    updated_at=base + timedelta(seconds=i + 1),
+                )
+                for i in range(events)
+            ]
+        )
+        db.commit()
+
+
+def measure(client: TestClient, repeat: int) -> tuple[list[float], int]:
+    timings = []
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get("/sync/updates", params={"since": 0})
+        timings.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        count = len(response.json())
+    return timings, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--notes-ratio", type=float, default=0.5, help="notas distintas / eventos")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    print(f"{'eventos':>8} {'notas':>7} {'itens':>7} {'p50 ms':>9} {'max ms':>9}")
+    for size in args.sizes:
+        notes = max(1, int(size * args.notes_ratio))
+        seed(size, notes)
+        timings, count = measure(client, args.repeat)
+        print(f"{size:>8} {notes:>7} {count:>7} {statistics.median(timings):>9.1f} {max(timings):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Peças comuns dos benchmarks: banco temporário, contagem de queries por
+requisição, percentis e baselines em JSON.
+"""
+import contextvars
+import json
+import os
+import statistics
+import tempfile
+from typing import Dict, List, Optional
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+# Variação de queries/req aceita entre execuções com a mesma semente
+QUERY_SLACK = 0.25
+# Aumento tolerado na taxa de erros de uma operação (fração das requisições)
+ERROR_SLACK = 0.01
+
+
+def use_temp_database() -> None:
+    """Point DATABASE_URL at a fresh SQLite file unless one is already set."""
+    # Os clientes virtuais saem todos do mesmo IP; o benchmark mede o app, não o limitador.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    # Idem para a fila do bcrypt: com poucos núcleos, rajadas de login passam
+    # do limite e viram 503; a espera na fila continua aparecendo no p95.
+    os.environ.setdefault("PASSWORD_HASH_QUEUE_LIMIT", "1000")
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(prefix="stickycutie-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+_current_queries: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("bench_queries", default=None)
+
+
+class QueryCounter:
+    """
+    Counts SQL statements per request. Requests go through as_asgi() with
+    an X-Bench-Id header; the count is kept under that id until pop().
+    The counter lives in a contextvar, which Starlette copies into the
+    threadpool, so sync routes and streamed bodies are counted too.
+    """
+
+    def __init__(self, *engines) -> None:
+        from sqlalchemy import event
+
+        self._counts: Dict[str, int] = {}
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    @staticmethod
+    def _on_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        counter = _current_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def pop(self, request_id: str) -> int:
+        return self._counts.pop(request_id, 0)
+
+    def as_asgi(self, app):
+        async def wrapper(scope, receive, send):
+            if scope["type"] != "http":
+                await app(scope, receive, send)
+                return
+            request_id = dict(scope["headers"]).get(b"x-bench-id", b"").decode("latin-1")
+            counter = [0]
+            token = _current_queries.set(counter)
+            try:
+                await app(scope, receive, send)
+            finally:
+                _current_queries.reset(token)
+                if request_id:
+                    self._counts[request_id] = counter[0]
+
+        return wrapper
+
+
+def summarize(timings: Dict[str, List[float]], queries: Dict[str, List[int]], wall_seconds: float) -> dict:
+    """Per-operation p50/p95/p99, throughput and mean queries per request."""
+    operations = {}
+    total = 0
+    for name in sorted(timings):
+        values = timings[name]
+        if not values:
+            continue
+        total += len(values)
+        counts = queries.get(name) or [0]
+        operations[name] = {
+            "requests": len(values),
+            "p50_ms": round(statistics.median(values), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "queries_per_request": round(statistics.mean(counts), 2),
+        }
+    return {
+        "requests": total,
+        "seconds": round(wall_seconds, 2),
+        "throughput_rps": round(total / wall_seconds, 1) if wall_seconds else 0.0,
+        "operations": operations,
+    }
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name: str, report: dict) -> str:
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(name)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    return path
+
+
+def load_baseline(name: str) -> Optional[dict]:
+    path = baseline_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def error_rate(report: dict, name: str) -> float:
+    requests = report["operations"].get(name, {}).get("requests", 0)
+    return report.get("errors", {}).get(name, 0) / requests if requests else 0.0
+
+
+def compare(baseline: dict, report: dict, tolerance: float) -> List[str]:
+    """
+    Regressions of `report` against `baseline`: p95 above the baseline by
+    more than `tolerance` (fraction), queries per request above it by more
+    than QUERY_SLACK, or an error rate above it by more than ERROR_SLACK.
+    The query count does not depend on the machine, only on interleaving
+    (cache hits, empty acks), hence the small slack. Failed requests are
+    usually fast, so a p95 that improved because requests failed still
+    counts as a regression.
+    """
+    regressions = []
+    for name, current in report["operations"].items():
+        previous = baseline.get("operations", {}).get(name)
+        if previous is None:
+            continue
+        before, after = error_rate(baseline, name), error_rate(report, name)
+        if after > before + ERROR_SLACK:
+            regressions.append(f"{name}: error rate {before:.1%} -> {after:.1%}")
+        if current["queries_per_request"] > previous["queries_per_request"] + QUERY_SLACK:
+            regressions.append(
+                f"{name}: queries/req {previous['queries_per_request']} -> {current['queries_per_request']}"
+            )
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+    return regressions
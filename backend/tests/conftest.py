@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# O engine é criado na importação de app.database: o banco de teste precisa
+# estar no ambiente antes disso.
+_DB_DIR = tempfile.mkdtemp(prefix="stickycutie-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.core.cache import cache  # noqa: E402
+from app.database import Base, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@event.listens_for(engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # Como no Postgres: uma referência pendente falha o statement.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+@pytest.fixture
+def client():
+    """TestClient over an empty database; the lifespan jobs are not started."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    cache.clear()
+    yield TestClient(app)
+    engine.dispose()
+
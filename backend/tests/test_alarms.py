@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from app.jobs.alarms import ALARM_EVENT, AlarmScheduler
+
+
+def _note(note_id: str, updated_at: int, **fields) -> dict:
+    return {
+        "id": note_id,
+        "title": note_id,
+        "content": f"<FlowDocument><Paragraph><Run>{note_id}</Run></Paragraph></FlowDocument>",
+        "updated_at": updated_at,
+        "target_user_id": "",
+        "created_by_user_id": "",
+        "group_id": "1",
+        **fields,
+    }
+
+
+def _login(client) -> dict:
+    client.post("/groups/create", json={"name": "g"})
+    token = client.post(
+        "/users/register",
+        json={"name": "u", "email": "u@example.com", "password": "pw123456", "group_id": 1},
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_alarm_due_does_not_repeat_on_updates(client):
+    headers = _login(client)
+    alarm_at = int((datetime.utcnow() - timedelta(seconds=5)).timestamp())
+    assert client.post("/sync/send", json=_note("a", 1000, alarm_at=alarm_at)).status_code == 201
+    assert AlarmScheduler().tick()["fired"] == 1
+
+    # O cliente avança `since` pelo updated_at das notas recebidas.
+    since = 0
+    seen = []
+    for _ in range(3):
+        events = client.get("/sync/updates", params={"since": since, "group_id": 1}).json()
+        seen.extend(event["event_type"] for event in events)
+        since = max([since] + [event["note"]["updated_at"] for event in events])
+    assert seen == ["note"]
+
+    # O alarme continua saindo no feed por id.
+    changes = client.get("/sync/changes", params={"group_id": 1}, headers=headers).json()
+    assert [event["event_type"] for event in changes["events"]] == [ALARM_EVENT]
@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.jobs.alarms import AlarmScheduler
+from app.jobs.compaction import compact_sync_events
+from tests.test_alarms import _login, _note
+
+
+def test_alarm_due_does_not_supersede_the_note(client):
+    headers = _login(client)
+    alarm_at = int((datetime.utcnow() - timedelta(seconds=5)).timestamp())
+    assert client.post("/sync/send", json=_note("a", 1000, alarm_at=alarm_at)).status_code == 201
+    assert AlarmScheduler().tick()["fired"] == 1
+
+    changes = client.get("/sync/changes", params={"group_id": 1}, headers=headers).json()
+    event_ids = [event["event_id"] for event in changes["events"]]
+    ack = client.post("/sync/ack", json={"event_ids": event_ids, "client_id": "dev1"}, headers=headers)
+    assert ack.status_code == 200
+
+    db = SessionLocal()
+    try:
+        compact_sync_events(db)
+    finally:
+        db.close()
+
+    events = client.get("/sync/updates", params={"since": 0, "group_id": 1}).json()
+    assert [event["event_type"] for event in events] == ["note"]
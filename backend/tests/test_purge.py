@@ -0,0 +1,84 @@
+from sqlalchemy import event, text
+
+from app.database import SessionLocal, engine
+from app.jobs import purge
+
+
+def _note(note_id: str, updated_at: int, group_id: int = 1, user_id: int = 1) -> dict:
+    return {
+        "id": note_id,
+        "title": note_id,
+        "content": f"<FlowDocument><Paragraph><Run>{note_id} {updated_at}</Run></Paragraph></FlowDocument>",
+        "updated_at": updated_at,
+        "target_user_id": "",
+        "created_by_user_id": str(user_id),
+        "group_id": str(group_id),
+    }
+
+
+def _seed(client) -> None:
+    for name in ("a", "b"):
+        client.post("/groups/create", json={"name": name})
+    for group_id in (1, 2):
+        client.post(
+            "/users/register",
+            json={"name": "u", "email": f"u{group_id}@example.com", "password": "pw123456", "group_id": group_id},
+        )
+    for index in range(6):
+        client.post("/sync/send", json=_note(f"n{index}", 1, group_id=1 + index % 2, user_id=1 + index % 2))
+
+
+# Commits do purge seguidos de uma escrita; depois o purge termina sozinho.
+WRITES = 12
+
+
+def _run_with_writes(client, run, write) -> purge.PurgeReport:
+    """Run a purge in chunks of one row; `write` runs after each of its first commits."""
+    clock = iter(range(100, 100 + WRITES))
+
+    def on_commit(session):
+        ts = next(clock, None)
+        if ts is not None:
+            write(client, ts)
+
+    db = SessionLocal()
+    event.listen(db, "after_commit", on_commit)
+    report = purge.PurgeReport("test")
+    try:
+        run(db, report)
+    finally:
+        db.close()
+    return report
+
+
+def _dangling_references() -> list:
+    with engine.connect() as connection:
+        return connection.execute(text("PRAGMA foreign_key_check")).all()
+
+
+def test_reset_with_concurrent_writes(client):
+    _seed(client)
+
+    def write(client, ts):
+        # Evento novo para uma nota e um usuário que o reset vai apagar.
+        client.post("/sync/send", json=_note("n0", ts))
+
+    report = _run_with_writes(client, lambda db, report: purge.reset_database(db, report, chunk=1), write)
+    assert report.deleted["notes"] >= 6
+    assert report.deleted["users"] == 2
+    assert _dangling_references() == []
+
+
+def test_group_purge_with_concurrent_writes(client):
+    _seed(client)
+
+    def write(client, ts):
+        client.post("/sync/send", json=_note("n0", ts))
+        # Usuário do grupo apagado escrevendo em outro grupo.
+        client.post("/sync/send", json=_note("n1", ts, group_id=2, user_id=1))
+
+    report = _run_with_writes(client, lambda db, report: purge.purge_group(db, 1, report, chunk=1), write)
+    assert report.deleted["groups"] == 1
+    assert _dangling_references() == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM notes WHERE group_id = 2")).scalar() == 3